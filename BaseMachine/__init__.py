@@ -14,7 +14,8 @@ from .action_utils import (
     create_new_chat_action,
     create_context_filling_new_chat_action,
     create_context_filling_new_chat_json_action,
-    call_sub_state_machine_action
+    call_sub_state_machine_action,
+    call_sub_state_machines_action
 )
 
 # Agent action utilities
@@ -33,6 +34,7 @@ __all__ = [
     'create_context_filling_new_chat_action',
     'create_context_filling_new_chat_json_action',
     'call_sub_state_machine_action',
+    'call_sub_state_machines_action',
     # Agent actions
     'create_agent_action',
 ]
@@ -4,46 +4,31 @@ Contains various action functions for interacting with LLMs
 """
 
 from typing import Any, List
+from functools import lru_cache
 from pydantic import BaseModel, Field
 import logging
+import sys
 from colorama import Fore
 import json
 import requests
 # Fix import errors by adapting to different OpenAI library versions
 try:
-    # Try importing from newer version
     from openai.types.chat import ChatCompletion, ChatCompletionMessage
-    from openai.types.chat.chat_completion import Choice
-except ImportError:
     try:
+        # Try importing from newer version
+        from openai.types.chat.chat_completion import Choice
+    except ImportError:
         # Try importing from another possible location
-        from openai.types.chat import ChatCompletion, ChatCompletionMessage
         from openai.types import Choice
-    except ImportError:
-        # If both fail, create a simple implementation
-        class ChatCompletion:
-            def __init__(self, id, choices, created, model, object, system_fingerprint, usage):
-                self.id = id
-                self.choices = choices
-                self.created = created
-                self.model = model
-                self.object = object
-                self.system_fingerprint = system_fingerprint
-                self.usage = usage
-                
-        class ChatCompletionMessage:
-            def __init__(self, content, role, function_call=None, tool_calls=None):
-                self.content = content
-                self.role = role
-                self.function_call = function_call
-                self.tool_calls = tool_calls
-                
-        class Choice:
-            def __init__(self, finish_reason, index, message, logprobs=None):
-                self.finish_reason = finish_reason
-                self.index = index
-                self.message = message
-                self.logprobs = logprobs
+except ImportError:
+    # Without the SDK, fall back to call-compatible SimpleNamespace
+    # factories; cheaper to build than the old custom stub classes
+    from types import SimpleNamespace
+
+    def _openai_type_stub(**kwargs):
+        return SimpleNamespace(**kwargs)
+
+    ChatCompletion = ChatCompletionMessage = Choice = _openai_type_stub
 
 
 class ContextCode(BaseModel):
@@ -56,14 +41,72 @@ class Response(BaseModel):
     analysis: str = Field(description="The analysis result of the question.")
     context_code: List[str] = Field(description="If you need additional context code to analyze the question, please provide the context code's names you need additionally to analyze the question.")
 
+# Import cache-friendly message layout helpers
+from BaseMachine.prompt_layout import canonicalize_messages
+
+# Import response cache for deterministic low-temperature traffic
+from BaseMachine.llm_cache import (
+    cache_enabled,
+    response_cache,
+    CachedCompletion,
+    CACHE_TEMPERATURE_THRESHOLD
+)
+
 # Import helper functions
 from BaseMachine.llm_helpers import (
-    reliable_parse, 
-    safe_format, 
-    extract_code_snippets, 
+    reliable_parse,
+    safe_format,
+    compile_template,
+    extract_code_snippets,
     parse_and_validate_json_response
 )
 
+# Models that reject temperature/top_p overrides; interned so membership
+# tests against interned registry names resolve by pointer comparison
+_NO_SAMPLING_MODELS = frozenset(map(sys.intern, ('o1-mini', 'o1-preview')))
+
+
+@lru_cache(maxsize=None)
+def _supports_sampling_params(model_name):
+    """Whether the model accepts temperature/top_p overrides (the o1 reasoning models reject them)."""
+    return model_name not in _NO_SAMPLING_MODELS
+
+
+def _make_analysis_saver(save_option, sub=False):
+    """
+    Resolve the save_option branch once at action-creation time and return
+    a (machine, prompt, result) callable. A bad option fails fast here
+    instead of on the first LLM turn, and the hot path pays one indirect
+    call instead of a string-compare chain.
+    """
+    from BaseMachine.state_machine import ANALYSIS_PROMPT, ANALYSIS_RESULT, ANALYSIS_BOTH, ANALYSIS_SUB
+    both_kind = ANALYSIS_SUB if sub else ANALYSIS_BOTH
+    if save_option == 'prompt':
+        return lambda machine, prompt, result: machine.append_analysis(ANALYSIS_PROMPT, prompt=prompt)
+    elif save_option == 'result':
+        return lambda machine, prompt, result: machine.append_analysis(ANALYSIS_RESULT, result=result)
+    elif save_option == 'both':
+        return lambda machine, prompt, result: machine.append_analysis(both_kind, prompt=prompt, result=result)
+    elif save_option == 'none':
+        return lambda machine, prompt, result: None
+    else:
+        # If an invalid save_option is provided, throw an exception or perform default handling
+        raise ValueError("Invalid save_option value. Choose from 'prompt', 'result', or 'both'.")
+
+
+def _lookup_client(machine, model_name):
+    """
+    Resolve (client, info) for a model name, building a per-machine
+    name index on first use so later lookups are O(1) instead of a
+    linear scan over machine.clients.
+    """
+    index = getattr(machine, '_client_by_name', None)
+    if index is None:
+        index = {info['name']: (client, info) for client, info in machine.clients}
+        machine._client_by_name = index
+    return index.get(model_name, (None, None))
+
+
 def create_chat_action(prompt_template, response_parser=None, save_option='both', model_name='azure-gpt4o', debug=False):
     """
     Create a chat action function for sending prompts and handling responses.
@@ -76,9 +119,24 @@ def create_chat_action(prompt_template, response_parser=None, save_option='both'
     :param debug: Whether to enable debugging
     :return: The action function
     """
+    # Compile the template once at closure creation so each call only joins
+    # the cached literal parts with the interpolated values instead of
+    # re-parsing the template string.
+    render_prompt = compile_template(prompt_template)
+
+    # Resolve the save_option dispatch once for the closure's lifetime
+    save_analysis = _make_analysis_saver(save_option)
+
     def chat_action(machine, **kwargs):
         from BaseMachine.state_machine import StateMachine  # Move import here
-        prompt = prompt_template.format(**kwargs)
+
+        # Canonicalize the seeded history once so repeated runs share a
+        # byte-identical prefix and hit the provider's KV cache
+        if machine.messages and not getattr(machine, '_messages_canonicalized', False):
+            machine.messages[:] = canonicalize_messages(machine.messages)
+            machine._messages_canonicalized = True
+
+        prompt = render_prompt(kwargs)
 
         if debug:
             logging.info(Fore.BLUE + f'Chat Action Prompt: {prompt}')
@@ -86,32 +144,62 @@ def create_chat_action(prompt_template, response_parser=None, save_option='both'
         machine.messages.append({"role": "user", "content": prompt})
 
         # Select the appropriate client based on model_name
-        client_to_use, info = next(((client, info) for client, info in machine.clients if info['name'] == model_name), (None, None))
+        client_to_use, info = _lookup_client(machine, model_name)
         if client_to_use is None:
             raise ValueError(f"Model '{model_name}' not found in initialized clients.")
 
-        # Ensure info is a dictionary
-        if isinstance(info, tuple):
-            info = dict(info)
-
         # Build request parameters based on whether response_parser is None or not
         request_params = {
             'model': info['model_name'],
             'messages': machine.messages,
             **(
                 {"temperature": 0.01, "top_p": machine.config.top_p}
-                if info['model_name'] not in ["o1-mini", "o1-preview"]
+                if _supports_sampling_params(info['model_name'])
                 else {}
             ),
         }
         if response_parser is not None:
             request_params['response_format'] = response_parser
 
+        # Serve deterministic (low-temperature) requests from the response
+        # cache when enabled, skipping the provider round-trip on a hit.
+        # Parsed actions return message.parsed (a live model object the
+        # disk cache cannot reconstruct), so they bypass the cache rather
+        # than change return type between first run and re-run
+        use_cache = (
+            cache_enabled()
+            and response_parser is None
+            and request_params.get('temperature', 1.0) <= CACHE_TEMPERATURE_THRESHOLD
+        )
+        cache_key = None
+        if use_cache:
+            cache_key = response_cache.make_key(
+                info['model_name'],
+                machine.messages,
+                response_parser,
+                request_params.get('temperature'),
+                request_params.get('top_p'),
+            )
+            cached_entry = response_cache.get(cache_key)
+            if cached_entry is not None:
+                logging.info(Fore.CYAN + f'Serving response for model {info["model_name"]} from cache.')
+                response = CachedCompletion(cached_entry['content'], info['model_name'])
+                machine.messages.append(
+                    {"role": "assistant", "content": response.choices[0].message.content}
+                )
+                message = response.choices[0].message
+                parsed_result = message.content
+                save_analysis(machine, prompt, parsed_result)
+                return parsed_result
+
         # Change to use the reliable_parse function to make the request
         # Use the selected client to make the request
         logging.info(Fore.YELLOW + f'Waiting for the model {info["model_name"]} to process the request...')
         response = reliable_parse(client_to_use, request_params, max_retries=3, debug=debug, model_info=info)
         logging.info(Fore.GREEN + f'Model {info["model_name"]} processed the request successfully.')
+
+        if use_cache and response is not None:
+            response_cache.set(cache_key, response.choices[0].message.content)
         # machine.total_input_tokens += response.usage.prompt_tokens
         # machine.total_output_tokens += response.usage.completion_tokens
 
@@ -126,17 +214,7 @@ def create_chat_action(prompt_template, response_parser=None, save_option='both'
         parsed_result = message.content if getattr(message, "parsed", None) is None else message.parsed
 
         # Save content based on the save_option parameter
-        if save_option == 'prompt':
-            machine.analysis_result.append(prompt)
-        elif save_option == 'result':
-            machine.analysis_result.append(parsed_result)
-        elif save_option == 'both':
-            machine.analysis_result.append({'prompt': prompt, 'result': parsed_result})
-        elif save_option == 'none':
-            pass
-        else:
-            # If an invalid save_option is provided, throw an exception or perform default handling
-            raise ValueError("Invalid save_option value. Choose from 'prompt', 'result', or 'both'.")
+        save_analysis(machine, prompt, parsed_result)
 
         return parsed_result
 
@@ -199,6 +277,9 @@ def call_sub_state_machine_action(sub_state_definitions, sub_initial_state, sub_
     :param save_option: Save option, can be 'both', 'prompt', 'result', or 'none'
     :return: The action function
     """
+    # Resolve the save_option dispatch once for the closure's lifetime
+    save_analysis = _make_analysis_saver(save_option, sub=True)
+
     def sub_state_machine_action(machine, **kwargs):
         from BaseMachine.state_machine import StateMachine  # Move import here
         # Create the sub-state machine's context
@@ -219,15 +300,69 @@ def call_sub_state_machine_action(sub_state_definitions, sub_initial_state, sub_
         machine.messages.extend(sub_machine.messages)
         
         # Save content based on the save_option parameter
-        if save_option == 'prompt':
-            machine.analysis_result.append(sub_context)
-        elif save_option == 'result':
-            machine.analysis_result.append(sub_result)
-        elif save_option == 'both':
-            machine.analysis_result.append({'context': sub_context, 'result': sub_result})
-        else:
-            # If an invalid save_option is provided, throw an exception or perform default handling
-            raise ValueError("Invalid save_option value. Choose from 'prompt', 'result', or 'both'.")
+        save_analysis(machine, sub_context, sub_result)
         
         return sub_result
     return sub_state_machine_action
+
+
+def call_sub_state_machines_action(sub_state_definitions, sub_initial_state, sub_context_cls, save_option='both', contexts_kwarg='contexts', max_concurrency=8):
+    """
+    Create an action function that runs several independent sub-state
+    machines concurrently. Each sub-machine owns its own context and
+    message history, so the only shared work is merging results and token
+    counts back into the parent once all of them finish.
+
+    :param sub_state_definitions: The sub-state machine's state definitions
+    :param sub_initial_state: The sub-state machine's initial state
+    :param sub_context_cls: The sub-state machine's context class
+    :param save_option: Save option, can be 'both', 'prompt', 'result', or 'none'
+    :param contexts_kwarg: Name of the kwarg holding the list of context kwargs
+    :param max_concurrency: Maximum number of sub-machines running at once
+    :return: The action function
+    """
+    # Resolve the save_option dispatch once for the closure's lifetime
+    save_analysis = _make_analysis_saver(save_option, sub=True)
+
+    def sub_state_machines_action(machine, **kwargs):
+        import anyio
+        from BaseMachine.state_machine import StateMachine  # Move import here
+
+        context_kwargs_list = kwargs[contexts_kwarg]
+        sub_machines = []
+        for context_kwargs in context_kwargs_list:
+            sub_context = sub_context_cls(**context_kwargs)
+            sub_machines.append(StateMachine(
+                context=sub_context,
+                state_definitions=sub_state_definitions,
+                initial_state=sub_initial_state,
+                config_path=machine.config.config_path
+            ))
+
+        # Results are stored by index so the merged output keeps the
+        # stable input order regardless of completion order.
+        sub_results = [None] * len(sub_machines)
+
+        async def run_all():
+            semaphore = anyio.Semaphore(max_concurrency)
+
+            async def run_one(index, sub_machine):
+                async with semaphore:
+                    sub_results[index] = await anyio.to_thread.run_sync(sub_machine.process)
+
+            async with anyio.create_task_group() as task_group:
+                for index, sub_machine in enumerate(sub_machines):
+                    task_group.start_soon(run_one, index, sub_machine)
+
+        anyio.run(run_all)
+
+        # Merge the sub-state machines' results and resource consumption
+        for sub_machine, sub_result in zip(sub_machines, sub_results):
+            machine.total_input_tokens += sub_machine.total_input_tokens
+            machine.total_output_tokens += sub_machine.total_output_tokens
+            machine.messages.extend(sub_machine.messages)
+
+            save_analysis(machine, sub_machine.context, sub_result)
+
+        return sub_results
+    return sub_state_machines_action
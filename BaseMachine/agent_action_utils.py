@@ -1,9 +1,13 @@
 # agent_action_utils.py
 
-import anyio
+import dataclasses
 import logging
 import json
 import os
+import queue
+import threading
+import time
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Callable, Dict, Optional, List, AsyncIterator, Union, TYPE_CHECKING
@@ -13,6 +17,8 @@ SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 if TYPE_CHECKING:
     from BaseMachine.state_machine import StateMachine
+from BaseMachine.event_loop import run_coroutine
+from BaseMachine.llm_helpers import compile_template
 from claude_code_sdk import (
     query,
     ClaudeCodeOptions,
@@ -30,19 +36,77 @@ from claude_code_sdk import (
 
 logger = logging.getLogger(__name__)
 
+# orjson's C encoder is several times faster than stdlib json and can append
+# the newline itself; fall back to stdlib when it isn't installed
+try:
+    import orjson
+
+    def _encode_jsonl(obj):
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+except ImportError:
+    def _encode_jsonl(obj):
+        return (json.dumps(obj) + '\n').encode()
+
 
 class StreamingJSONLogger:
     """
     Logger for saving streaming JSON messages from Claude Code SDK.
     """
-    def __init__(self, base_log_dir: str = None):
+    def __init__(self, base_log_dir: str = None, debug: bool = False):
         if base_log_dir is None:
             base_log_dir = os.path.join(SCRIPT_DIR, 'qlworkspace')
         self.base_log_dir = Path(base_log_dir)
         self.base_log_dir.mkdir(parents=True, exist_ok=True)
         self.current_session_id = None
-        self.session_messages = []
-        
+        self.debug = debug
+        # Every message already lands in the JSONL file, so in memory we only
+        # keep a running count (and, in debug mode, a small tail ring for
+        # inspection) instead of the full message list.
+        self._message_count = 0
+        self._message_tail = deque(maxlen=256) if debug else None
+        # Per-message timestamps are recorded as monotonic deltas from the
+        # session start; the wall-clock anchor is written once into the
+        # session_start record (see reconstruct_timestamps for offline use)
+        self._session_start_ns = None
+        # Writes go through a single long-lived handle drained by a daemon
+        # thread, so log_message never blocks the streaming query loop on
+        # per-message open/close or disk latency.
+        self._session_fh = None
+        self._fh_lock = threading.Lock()
+        self._write_queue = queue.Queue(maxsize=4096)
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+
+    def _writer_loop(self):
+        """Drain queued log lines to the current session file."""
+        while True:
+            item = self._write_queue.get()
+            if isinstance(item, threading.Event):
+                # Flush barrier: sync what we have and signal the waiter
+                with self._fh_lock:
+                    if self._session_fh is not None:
+                        self._session_fh.flush()
+                item.set()
+                continue
+            with self._fh_lock:
+                if self._session_fh is not None:
+                    self._session_fh.write(item)
+
+    def _flush_writes(self):
+        """Block until all queued writes have reached the file."""
+        barrier = threading.Event()
+        self._write_queue.put(barrier)
+        barrier.wait()
+
+    def _open_session_file(self):
+        """Open the session's JSONL file, closing any previous handle."""
+        log_path = self.session_log_dir / f"{self.current_session_id}.jsonl"
+        self._flush_writes()
+        with self._fh_lock:
+            if self._session_fh is not None:
+                self._session_fh.close()
+            self._session_fh = open(log_path, 'ab', buffering=1 << 16)
+
     def create_session(self, context: Dict[str, Any]) -> str:
         """
         Create a new logging session.
@@ -67,13 +131,19 @@ class StreamingJSONLogger:
             self.session_log_dir = self.base_log_dir / 'sessions' / self.current_session_id
         
         self.session_log_dir.mkdir(parents=True, exist_ok=True)
-        self.session_messages = []
-        
-        # Log session start
+        self._message_count = 0
+        if self._message_tail is not None:
+            self._message_tail.clear()
+        self._open_session_file()
+        self._session_start_ns = time.monotonic_ns()
+
+        # Log session start; this record carries the wall-clock anchor for
+        # the monotonic deltas on subsequent messages
         self.log_message({
             'type': 'session_start',
             'session_id': self.current_session_id,
             'timestamp': timestamp,
+            'start_timestamp': datetime.now().isoformat(),
             'context': context
         })
         
@@ -90,16 +160,23 @@ class StreamingJSONLogger:
             logger.warning("No active session. Message not logged.")
             return
         
-        # Add timestamp if not present
+        # Record a monotonic delta from session start instead of formatting
+        # a wall-clock string per message; datetime.isoformat dominates when
+        # the message itself is small
         if 'timestamp' not in message:
-            message['timestamp'] = datetime.now().isoformat()
-        
-        self.session_messages.append(message)
-        
-        # Write to single log file (append mode) - no longer separate streaming file
-        log_path = self.session_log_dir / f"{self.current_session_id}.jsonl"
-        with open(log_path, 'a') as f:
-            f.write(json.dumps(message) + '\n')
+            if self._session_start_ns is not None:
+                message['dt_ns'] = time.monotonic_ns() - self._session_start_ns
+            else:
+                message['timestamp'] = datetime.now().isoformat()
+
+
+        self._message_count += 1
+        if self._message_tail is not None:
+            self._message_tail.append(message)
+
+        # Hand the serialized line to the writer thread; the single JSONL
+        # handle stays open for the whole session
+        self._write_queue.put(_encode_jsonl(message))
     
     def finalize_session(self, result: Any = None):
         """
@@ -121,59 +198,118 @@ class StreamingJSONLogger:
         
         # No need to save a separate complete log file - the JSONL file has everything
         # Just log the final statistics
-        logger.info(f"Session {self.current_session_id} completed with {len(self.session_messages)} messages")
+        logger.info(f"Session {self.current_session_id} completed with {self._message_count} messages")
         
         logger.info(f"Session {self.current_session_id} finalized. Logs saved to {self.session_log_dir}")
-        
+
+        # Drain pending writes and close the session file
+        self._flush_writes()
+        with self._fh_lock:
+            if self._session_fh is not None:
+                self._session_fh.close()
+                self._session_fh = None
+
         # Reset session
         self.current_session_id = None
-        self.session_messages = []
+        self._session_start_ns = None
+        self._message_count = 0
+        if self._message_tail is not None:
+            self._message_tail.clear()
+
+
+def reconstruct_timestamps(log_path: str) -> List[Dict[str, Any]]:
+    """
+    Rebuild absolute ISO timestamps for a session JSONL file whose
+    messages carry monotonic deltas (dt_ns) from the session start.
+
+    Args:
+        log_path: Path to the session's JSONL file
+
+    Returns:
+        The parsed messages with a 'timestamp' field filled in
+    """
+    from datetime import timedelta
+
+    messages = []
+    anchor = None
+    with open(log_path, 'r') as f:
+        for line in f:
+            message = json.loads(line)
+            if message.get('type') == 'session_start' and 'start_timestamp' in message:
+                anchor = datetime.fromisoformat(message['start_timestamp'])
+            if 'timestamp' not in message and 'dt_ns' in message and anchor is not None:
+                message['timestamp'] = (anchor + timedelta(microseconds=message['dt_ns'] / 1000)).isoformat()
+            messages.append(message)
+    return messages
 
 
 # Global logger instance
 streaming_logger = StreamingJSONLogger()
 
 
+def _message_type_name(message: Any) -> str:
+    return type(message).__name__.lower().replace('message', '')
+
+
+def _build_plain_message(message: Any) -> Dict[str, Any]:
+    """Builder for System/User messages carrying plain content."""
+    return {
+        'type': _message_type_name(message),
+        'content': str(message.content) if hasattr(message, 'content') else ''
+    }
+
+
+def _build_assistant_message(message: Any) -> Dict[str, Any]:
+    """Builder for AssistantMessage with text/tool_use content blocks."""
+    return {
+        'type': _message_type_name(message),
+        'content': [
+            {'type': 'text', 'text': block.text}
+            if type(block) is TextBlock
+            else {'type': 'tool_use', 'name': block.name, 'input': block.input}
+            for block in message.content
+            if type(block) is TextBlock or type(block) is ToolUseBlock
+        ]
+    }
+
+
+def _build_result_message(message: Any) -> Dict[str, Any]:
+    """Builder for ResultMessage metadata."""
+    fields = getattr(message, '__dict__', {})
+    return {
+        'type': _message_type_name(message),
+        'session_id': fields.get('session_id'),
+        'duration': fields.get('duration'),
+        'total_cost': fields.get('total_cost'),
+        'turn_count': fields.get('turn_count')
+    }
+
+
+def _build_default_message(message: Any) -> Dict[str, Any]:
+    return {'type': _message_type_name(message)}
+
+
+# Type-keyed dispatch table built once at import; the parser runs inside
+# the streaming loop, so a single dict lookup replaces the isinstance chain
+_MESSAGE_BUILDERS = {
+    SystemMessage: _build_plain_message,
+    UserMessage: _build_plain_message,
+    AssistantMessage: _build_assistant_message,
+    ResultMessage: _build_result_message,
+}
+
+
 def parse_streaming_json_message(message: Any) -> Dict[str, Any]:
     """
     Parse a streaming JSON message from Claude Code SDK.
-    
+
     Args:
         message: The message object from the SDK
-        
+
     Returns:
         A dictionary representing the JSON message
     """
-    message_dict = {
-        'type': type(message).__name__.lower().replace('message', '')
-    }
-    
-    if isinstance(message, (SystemMessage, UserMessage)):
-        message_dict['content'] = str(message.content) if hasattr(message, 'content') else ''
-    elif isinstance(message, AssistantMessage):
-        content_list = []
-        for block in message.content:
-            if isinstance(block, TextBlock):
-                content_list.append({
-                    'type': 'text',
-                    'text': block.text
-                })
-            elif isinstance(block, ToolUseBlock):
-                content_list.append({
-                    'type': 'tool_use',
-                    'name': block.name,
-                    'input': block.input
-                })
-        message_dict['content'] = content_list
-    elif isinstance(message, ResultMessage):
-        message_dict.update({
-            'session_id': getattr(message, 'session_id', None),
-            'duration': getattr(message, 'duration', None),
-            'total_cost': getattr(message, 'total_cost', None),
-            'turn_count': getattr(message, 'turn_count', None)
-        })
-    
-    return message_dict
+    return _MESSAGE_BUILDERS.get(type(message), _build_default_message)(message)
 
 
 def create_agent_action(
@@ -206,18 +342,55 @@ def create_agent_action(
         debug: Enable debug logging
         
     Returns:
-        An action function that can be used in state definitions
+        An action function that can be used in state definitions. The
+        action renders prompt_template from its kwargs, unless a fully
+        rendered prompt is supplied via the reserved kwarg
+        'formatted_prompt'.
     """
+    # Compile the template once at closure creation. The literal runs never
+    # change between calls, so rendering by joining the cached parts keeps
+    # the prompt prefix byte-identical across invocations - a requirement
+    # for provider-side prefix (KV) cache hits.
+    render_prompt = compile_template(prompt_template)
+
+    # Sort the tool list once so the SDK serializes it identically on every
+    # call; a stable tool ordering keeps the request prefix cacheable.
+    allowed_tools = sorted(allowed_tools) if allowed_tools else []
+
+    # Everything except cwd is fixed for this closure, so construct the
+    # options object once. The system prompt stays a plain string: the
+    # CLI transport passes it straight to --system-prompt and has no
+    # cache_control channel, so a structured block list would only blow
+    # up in the subprocess launcher. The prompt being byte-identical
+    # across calls is what keeps the provider-side prefix cache warm.
+    # Kept as a dict so the non-dataclass fallback below can rebuild the
+    # options with a different cwd without re-listing every field
+    base_options_kwargs = {
+        'system_prompt': system_prompt,
+        'allowed_tools': allowed_tools,
+        'permission_mode': permission_mode,
+        'max_turns': max_turns,
+    }
+    base_options = ClaudeCodeOptions(cwd=None, **base_options_kwargs)
+
+    # Whether any streaming handling is needed at all, resolved once
+    stream_enabled = enable_stream_logging or output_format == 'stream-json'
+
     def action(machine: 'StateMachine', **kwargs) -> Any:
-        # Format the prompt using template
-        formatted_prompt = prompt_template.format(**kwargs)
+        # Callers that already materialized the prompt (e.g. to save it in
+        # a report) pass it through via the reserved 'formatted_prompt'
+        # kwarg and skip a second render of the full template
+        formatted_prompt = kwargs.pop('formatted_prompt', None)
+        if formatted_prompt is None:
+            # Format the prompt using the pre-parsed template
+            formatted_prompt = render_prompt(kwargs)
         
         if debug:
             logger.debug(f"Agent action prompt: {formatted_prompt}")
         
         # Initialize streaming logger session if enabled
         session_id = None
-        if enable_stream_logging or output_format == 'stream-json':
+        if stream_enabled:
             # Extract context from machine for logging
             log_context = {
                 'action_type': machine.context.get('action_type', 'general'),
@@ -229,36 +402,43 @@ def create_agent_action(
                 log_context['log_path'] = machine.context.session_log_path
             session_id = streaming_logger.create_session(log_context)
         
-        # Configure Claude Code options
-        options = ClaudeCodeOptions(
-            cwd=machine.context.get('working_directory', None),
-            allowed_tools=allowed_tools or [],
-            permission_mode=permission_mode,
-            system_prompt=system_prompt,
-            max_turns=max_turns
-        )
+        # Reuse the prebuilt options; only cwd varies per machine
+        cwd = machine.context.get('working_directory', None)
+        if cwd is None:
+            options = base_options
+        elif dataclasses.is_dataclass(base_options):
+            options = dataclasses.replace(base_options, cwd=cwd)
+        else:
+            options = ClaudeCodeOptions(cwd=cwd, **base_options_kwargs)
         
         # Collect all responses
         responses = []
         tool_uses = []
         streaming_messages = []
-        
+        message_count = 0
+
         try:
             # Run the async query synchronously
             async def run_query():
+                nonlocal message_count
                 async for message in query(prompt=formatted_prompt, options=options):
                     if debug:
                         logger.debug(f"Received message: {type(message).__name__}")
                     
                     # Handle streaming JSON output
-                    if output_format == 'stream-json' or enable_stream_logging:
+                    if stream_enabled:
                         json_message = parse_streaming_json_message(message)
-                        streaming_messages.append(json_message)
-                        
+                        # Only accumulate in memory when the caller actually
+                        # receives the list (stream-json output); the logging
+                        # path streams straight to disk
+                        if output_format == 'stream-json':
+                            streaming_messages.append(json_message)
+                        message_count += 1
+
                         # Log to file if enabled
                         if enable_stream_logging:
                             streaming_logger.log_message(json_message)
-                        
+
                         # Call stream callback if provided
                         if stream_callback:
                             stream_callback(json_message)
@@ -283,7 +463,9 @@ def create_agent_action(
                 
                 return responses, tool_uses, streaming_messages
             
-            responses, tool_uses, streaming_messages = anyio.run(run_query)
+            # Dispatch to the shared background loop instead of spinning up
+            # (and tearing down) a fresh event loop for every agent turn
+            responses, tool_uses, streaming_messages = run_coroutine(run_query())
             
             # Join all text responses
             full_response = '\n'.join(responses)
@@ -301,7 +483,7 @@ def create_agent_action(
                 streaming_logger.finalize_session({
                     'response_length': len(full_response),
                     'tool_use_count': len(tool_uses),
-                    'message_count': len(streaming_messages)
+                    'message_count': message_count
                 })
             
             # Parse response if parser provided
@@ -1,10 +1,33 @@
-from BaseMachine.code_filling.code_filling_tools import query_symbol_definition
+import hashlib
+import re
+
+from BaseMachine.code_filling.code_filling_tools import query_symbol_definition, query_symbol_definitions
 from BaseMachine.action_utils import create_chat_action
 
 # Control whether to guess the code definition or simply return "missing" message
 # Set to True to enable guessing, False to return missing definition message
 DEF_GUESS = False
 
+_WHITESPACE_RUN = re.compile(r'\s+')
+
+
+def _dedupe_search_results(results):
+    """
+    Collapse search results that differ only in whitespace, preserving
+    order. When OpenGrok returns near-duplicate definitions this often
+    leaves a single candidate, letting the state machine take the
+    UseSingleResult path instead of an LLM selection round-trip.
+    """
+    seen = set()
+    unique = []
+    for result in results:
+        normalized = _WHITESPACE_RUN.sub(' ', str(result)).strip()
+        digest = hashlib.blake2b(normalized.encode(), digest_size=16).digest()
+        if digest not in seen:
+            seen.add(digest)
+            unique.append(result)
+    return unique
+
 def initialize_system_prompt_action(machine) -> None:
     machine.messages = [
         {
@@ -13,10 +36,21 @@ def initialize_system_prompt_action(machine) -> None:
         }
     ]
     symbol = machine.context.name
-    machine.search_results = query_symbol_definition(symbol)
+    machine.search_results = _dedupe_search_results(query_symbol_definition(symbol))
+    # Record the count once so the transition doesn't recompute len()
+    machine._search_result_count = len(machine.search_results)
     machine.code_snippet = machine.context.context_code
     return None
 
+def prefetch_symbol_definitions(symbols, port=8080):
+    """
+    Warm the definition cache for a pre-collected batch of symbols so the
+    per-symbol sub-state machines hit the cache instead of issuing
+    sequential OpenGrok round-trips.
+    """
+    return query_symbol_definitions(symbols, port=port)
+
+
 def guess_the_code_action(machine):
     machine.definition = create_chat_action(
         prompt_template='''
@@ -72,33 +106,50 @@ def exit_action(machine):
     return None
 
 
+# Transition table for InitializeSystemPrompt keyed on a result-count
+# bucket (0, exactly 1, more than 1); resolved once at import time
+_INIT_NEXT_STATE = {
+    0: 'GuessTheCode' if DEF_GUESS else 'ReturnMissingDefinition',
+    1: 'UseSingleResult',
+    2: 'SelectAndChooseMostRelatedResult',
+}
+
+
+def _initialize_next_state(result, machine):
+    count = getattr(machine, '_search_result_count', None)
+    if count is None:
+        count = len(machine.search_results)
+    return _INIT_NEXT_STATE[0 if count == 0 else 1 if count == 1 else 2]
+
+
+# Shared transition for states that always terminate; one closure object
+# reused instead of one lambda allocation per state entry
+_goto_exit = lambda result, machine: 'Exit'
+
+
 # 1. init the system prompt (input is a symbol and context)
 # 2. choose the most related result (only if more than 1 result)
 # 3. use single result directly if only 1 result
 state_definitions = {
     'InitializeSystemPrompt': {
         'action': initialize_system_prompt_action,
-        'next_state_func': lambda result, machine: (
-            'SelectAndChooseMostRelatedResult' if len(machine.search_results) > 1 
-            else 'UseSingleResult' if len(machine.search_results) == 1 
-            else ('GuessTheCode' if DEF_GUESS else 'ReturnMissingDefinition')
-        ),
+        'next_state_func': _initialize_next_state,
     },
     'UseSingleResult': {
         'action': use_single_result_action,
-        'next_state_func': lambda result, machine: 'Exit',
+        'next_state_func': _goto_exit,
     },
     'SelectAndChooseMostRelatedResult': {
         'action': choose_most_related_result_action,
-        'next_state_func': lambda result, machine: 'Exit',
+        'next_state_func': _goto_exit,
     },
     'GuessTheCode': {
         'action': guess_the_code_action,
-        'next_state_func': lambda result, machine: 'Exit',
+        'next_state_func': _goto_exit,
     },
     'ReturnMissingDefinition': {
         'action': return_missing_definition_action,
-        'next_state_func': lambda result, machine: 'Exit',
+        'next_state_func': _goto_exit,
     },
     'Exit': {
         'action': exit_action,
@@ -1,6 +1,9 @@
 import os
 import sys
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from colorama import Fore
 # from flow_analysis.flow_context import execStep
 
@@ -10,14 +13,88 @@ sys.path.append(parent_dir)
 
 from AdvancedTools.CodeSearch.opengrok_search import CodeQueryManager  # Corrected import path
 
+# Process-wide query manager so repeated lookups reuse the same HTTP
+# connection instead of rebuilding the manager (and its TCP setup) per call.
+_query_manager = None
+_query_manager_lock = threading.Lock()
+
+
+def _configure_keepalive_session(manager):
+    """
+    Mount a pooled, retrying HTTPAdapter on the manager's requests session
+    (when it exposes one) so symbol lookups reuse warm connections instead
+    of paying TCP setup per query.
+    """
+    session = getattr(manager, 'session', None)
+    if session is None:
+        return
+    try:
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+    except ImportError:
+        return
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=64,
+        max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+
+def _get_query_manager(port=8080):
+    """
+    Return the shared CodeQueryManager, creating it on first use.
+    """
+    global _query_manager
+    if _query_manager is None:
+        with _query_manager_lock:
+            if _query_manager is None:
+                os.environ['OPENGROK_STATUS'] = 'ready'
+                manager = CodeQueryManager(port)
+                _configure_keepalive_session(manager)
+                _query_manager = manager
+    return _query_manager
+
+
+@lru_cache(maxsize=4096)
+def _query_definition_cached(symbol, port):
+    """
+    Query a single symbol definition through the shared manager,
+    memoizing results so repeated symbols skip the OpenGrok round-trip.
+    """
+    return _get_query_manager(port).query_definition(symbol)
+
+
 def query_symbol_definition(symbol, port=8080):
     """
     Query the definition of a symbol using CodeQueryManager.
     """
-    os.environ['OPENGROK_STATUS'] = 'ready'
-    query_manager = CodeQueryManager(port)
-    results = query_manager.query_definition(symbol)
-    return results
+    return _query_definition_cached(symbol, port)
+
+
+def query_symbol_definitions(symbols, port=8080, max_workers=16):
+    """
+    Query definitions for a batch of symbols, deduplicating repeats and
+    issuing the uncached lookups concurrently.
+
+    :param symbols: Iterable of symbol names
+    :param port: OpenGrok server port
+    :param max_workers: Maximum concurrent lookups
+    :return: Dict mapping each symbol to its search results
+    """
+    unique_symbols = list(dict.fromkeys(symbols))
+    if not unique_symbols:
+        return {}
+
+    if len(unique_symbols) == 1:
+        symbol = unique_symbols[0]
+        return {symbol: _query_definition_cached(symbol, port)}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_symbols))) as executor:
+        results = executor.map(lambda s: _query_definition_cached(s, port), unique_symbols)
+        return dict(zip(unique_symbols, results))
+
 
 # write a main
 if __name__ == '__main__':
@@ -26,4 +103,4 @@ if __name__ == '__main__':
     # tmpe env variable to avoid the error
     os.environ['OPENGROK_STATUS'] = 'ready'
     results = query_symbol_definition(symbol)
-    print(results)
\ No newline at end of file
+    print(results)
@@ -0,0 +1,51 @@
+"""
+Shared Event Loop Module
+Provides one long-lived asyncio loop running on a daemon thread so agent
+actions dispatch coroutines to it instead of paying event-loop setup and
+teardown on every call. Sharing the loop also lets concurrent agent
+actions reuse the SDK's connection pools.
+"""
+
+import asyncio
+import atexit
+import threading
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _shutdown(loop):
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def get_loop():
+    """
+    Return the shared event loop, starting its thread on first use.
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever,
+                    daemon=True,
+                    name='shared-event-loop'
+                )
+                thread.start()
+                atexit.register(_shutdown, loop)
+                _loop = loop
+    return _loop
+
+
+def run_coroutine(coro):
+    """
+    Run a coroutine on the shared loop and block until it completes.
+
+    Args:
+        coro: The coroutine to execute
+
+    Returns:
+        The coroutine's result (exceptions propagate to the caller)
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
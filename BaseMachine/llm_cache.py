@@ -0,0 +1,117 @@
+"""
+LLM Response Cache Module
+Disk-backed exact-match cache for deterministic (low-temperature) LLM calls.
+
+With temperature pinned near zero the provider's responses are effectively
+deterministic, so re-issuing an identical request only burns tokens and
+latency. The cache keys on the full request (model, message history,
+response format, sampling parameters) and stores the assistant's reply on
+disk so re-runs and retries can skip the network round-trip entirely.
+
+Enable by setting the environment variable QLRELAX_LLM_CACHE=1.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Get the directory of the script for relative paths
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cached responses above this temperature are considered non-deterministic
+# and are never served from or written to the cache.
+CACHE_TEMPERATURE_THRESHOLD = 0.1
+
+
+def cache_enabled():
+    """Whether the response cache is enabled via QLRELAX_LLM_CACHE=1."""
+    return os.environ.get('QLRELAX_LLM_CACHE') == '1'
+
+
+class _CachedMessage:
+    """Minimal stand-in for a ChatCompletionMessage on cache hits."""
+    def __init__(self, content):
+        self.content = content
+        self.role = 'assistant'
+        self.parsed = None
+
+
+class _CachedChoice:
+    def __init__(self, message):
+        self.message = message
+        self.finish_reason = 'stop'
+        self.index = 0
+
+
+class CachedCompletion:
+    """
+    Minimal stand-in for a ChatCompletion built from a cache entry.
+    Exposes the attributes chat actions actually read.
+    """
+    def __init__(self, content, model):
+        self.choices = [_CachedChoice(_CachedMessage(content))]
+        self.model = model
+
+
+class ResponseCache:
+    """
+    Exact-match response cache storing one JSON file per request key under
+    qlworkspace/llm_cache/. Entries expire after the configured TTL.
+    """
+
+    def __init__(self, cache_dir=None, ttl=7 * 86400):
+        if cache_dir is None:
+            cache_dir = os.path.join(SCRIPT_DIR, 'qlworkspace', 'llm_cache')
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def make_key(self, model_name, messages, response_parser, temperature, top_p):
+        """
+        Build a stable SHA-256 key over the normalized request.
+        """
+        payload = json.dumps({
+            'm': model_name,
+            'msgs': messages,
+            'rf': str(response_parser),
+            'tp': temperature,
+            'top_p': top_p,
+        }, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def get(self, key):
+        """
+        Return the cached entry dict for key, or None on miss/expiry.
+        """
+        try:
+            with open(self._entry_path(key), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entry.get('timestamp', 0) > self.ttl:
+            return None
+        return entry
+
+    def set(self, key, content):
+        """
+        Store the assistant reply content under key.
+        """
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entry = {'content': content, 'timestamp': time.time()}
+            with open(self._entry_path(key), 'w') as f:
+                json.dump(entry, f)
+        except OSError as e:
+            # Cache writes are best-effort; never fail the LLM call over them
+            logger.warning(f"Failed to write LLM cache entry: {e}")
+
+
+# Global cache instance
+response_cache = ResponseCache()
@@ -3,47 +3,152 @@ LLM Response Processing and Tool Functions Module
 Contains helper functions for LLM API interactions, response parsing, and formatting
 """
 
+import functools
+import hashlib
 import logging
 import json
+import random
 import re
+import string
+import sys
+import threading
+import time
+from collections import OrderedDict
 import requests
-from colorama import Fore
 
-# Fix import errors by adapting to different OpenAI library versions
 try:
-    # Try importing from newer version
-    from openai.types.chat import ChatCompletion, ChatCompletionMessage
-    from openai.types.chat.chat_completion import Choice
+    import orjson
+
+    def _dump_debug(obj):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS, default=str).decode()
 except ImportError:
-    try:
-        # Try importing from another possible location
-        from openai.types.chat import ChatCompletion, ChatCompletionMessage
-        from openai.types import Choice
-    except ImportError:
-        # If both fail, create a simple implementation
-        class ChatCompletion:
-            def __init__(self, id, choices, created, model, object, system_fingerprint, usage):
-                self.id = id
-                self.choices = choices
-                self.created = created
-                self.model = model
-                self.object = object
-                self.system_fingerprint = system_fingerprint
-                self.usage = usage
-                
-        class ChatCompletionMessage:
-            def __init__(self, content, role, function_call=None, tool_calls=None):
-                self.content = content
-                self.role = role
-                self.function_call = function_call
-                self.tool_calls = tool_calls
-                
-        class Choice:
-            def __init__(self, finish_reason, index, message, logprobs=None):
-                self.finish_reason = finish_reason
-                self.index = index
-                self.message = message
-                self.logprobs = logprobs
+    def _dump_debug(obj):
+        return json.dumps(obj, default=str, ensure_ascii=False)
+
+# OpenRouter extras: key-to-header renames and body keys passed through
+# verbatim. One set intersection replaces the old chain of sequential
+# membership checks per request
+_OR_HEADER_KEYS = {'http_referer': 'HTTP-Referer', 'x_title': 'X-Title'}
+_OR_BODY_KEYS = frozenset(
+    {'reasoning', 'provider', 'models', 'routes', 'transforms', 'stream_options'}
+)
+
+# Resolved lazily so that importing this module (and anything that pulls
+# it in transitively, e.g. BaseMachine.__init__) doesn't pay the
+# multi-second `import openai` cost for tools that never call an LLM
+_openai_types = None
+_Fore = None
+
+
+def _lazy_openai_types():
+    """Resolve the OpenAI response types on first use and cache them."""
+    global _openai_types
+    if _openai_types is None:
+        # Fix import errors by adapting to different OpenAI library versions
+        try:
+            from openai.types.chat import ChatCompletion, ChatCompletionMessage
+            try:
+                # Try importing from newer version
+                from openai.types.chat.chat_completion import Choice
+            except ImportError:
+                # Try importing from another possible location
+                from openai.types import Choice
+        except ImportError:
+            # Without the SDK, fall back to call-compatible SimpleNamespace
+            # factories; cheaper to build than the old custom stub classes
+            from types import SimpleNamespace
+
+            def _openai_type_stub(**kwargs):
+                return SimpleNamespace(**kwargs)
+
+            ChatCompletion = ChatCompletionMessage = Choice = _openai_type_stub
+        _openai_types = (ChatCompletion, ChatCompletionMessage, Choice)
+    return _openai_types
+
+
+def _get_fore():
+    """Import colorama's Fore on first use and cache it in a module global."""
+    global _Fore
+    if _Fore is None:
+        from colorama import Fore
+        _Fore = Fore
+    return _Fore
+
+
+# In-memory LRU of full parse responses keyed on the request payload.
+# Deterministic requests (temperature 0, or model_info['cache'] set)
+# short-circuit the provider entirely on a repeat
+_RESPONSE_CACHE = OrderedDict()
+_RESPONSE_CACHE_LOCK = threading.Lock()
+_RESPONSE_CACHE_MAX = 1024
+
+
+def _response_cache_key(merged_params):
+    payload = _dump_debug({
+        'model': merged_params.get('model'),
+        'messages': merged_params.get('messages'),
+        'temperature': merged_params.get('temperature'),
+        'top_p': merged_params.get('top_p'),
+        'response_format': merged_params.get('response_format'),
+    })
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class _LazyRepr:
+    """Defers serializing an object until a handler formats the record,
+    so effectively-disabled log calls never pay the json dump. The
+    result is cached, covering repeated logs of the same params."""
+
+    __slots__ = ('_obj', '_str')
+
+    def __init__(self, obj):
+        self._obj = obj
+        self._str = None
+
+    def __str__(self):
+        if self._str is None:
+            self._str = _dump_debug(self._obj)
+        return self._str
+
+
+_RETRYABLE_ERRORS = None
+_FATAL_ERRORS = None
+
+
+def _retry_error_classes():
+    """Resolve openai's error taxonomy lazily (retryable vs fatal)."""
+    global _RETRYABLE_ERRORS, _FATAL_ERRORS
+    if _RETRYABLE_ERRORS is None:
+        try:
+            import openai
+            _RETRYABLE_ERRORS = (
+                openai.RateLimitError,
+                openai.APIConnectionError,
+                openai.APITimeoutError,
+                openai.InternalServerError,
+            )
+            _FATAL_ERRORS = (openai.BadRequestError, openai.AuthenticationError)
+        except (ImportError, AttributeError):
+            # SDKs without this taxonomy: treat everything as retryable,
+            # matching the previous bare-except behavior
+            _RETRYABLE_ERRORS = (Exception,)
+            _FATAL_ERRORS = ()
+    return _RETRYABLE_ERRORS, _FATAL_ERRORS
+
+
+def _backoff_delay(attempt, base=1.0, cap=30.0):
+    """Exponential backoff with jitter so concurrent retriers spread out
+    instead of hammering a rate-limited provider in lockstep."""
+    return min(cap, base * (2 ** attempt)) * (1 + random.random() * 0.5)
+
+
+def __getattr__(name):
+    # Keep `from llm_helpers import ChatCompletion` working for external
+    # callers without re-eagerizing the openai import
+    if name in ('ChatCompletion', 'ChatCompletionMessage', 'Choice'):
+        types = _lazy_openai_types()
+        return types[('ChatCompletion', 'ChatCompletionMessage', 'Choice').index(name)]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def reliable_parse(client, request_params, max_retries=3, debug=False, model_info=None):
@@ -57,108 +162,206 @@ def reliable_parse(client, request_params, max_retries=3, debug=False, model_inf
     :param model_info: Optional model information containing additional parameters
     :return: The message content if successful, None otherwise
     """
-    # Initialize retry counter
-    retries = 0
-    
+    Fore = _get_fore()
+
     # Create a copy of request parameters
     merged_params = {**request_params}
-    
+
+
     # Handle OpenRouter provider
     if model_info and model_info.get('provider') == 'openrouter':
+        additional_kwargs = model_info.get('additional_kwargs', {})
+
         # Get OpenRouter API key
-        openrouter_api_key = model_info.get('openrouter_api_key', None)
-        if not openrouter_api_key and 'additional_kwargs' in model_info and 'openrouter_api_key' in model_info['additional_kwargs']:
-            openrouter_api_key = model_info['additional_kwargs']['openrouter_api_key']
-        
+        openrouter_api_key = (
+            model_info.get('openrouter_api_key')
+            or additional_kwargs.get('openrouter_api_key')
+        )
         if not openrouter_api_key:
             raise ValueError("OpenRouter API key not found in model_info")
-        
-        # Set up extra headers for OpenRouter
-        extra_headers = {}
-        if 'additional_kwargs' in model_info:
-            if 'http_referer' in model_info['additional_kwargs']:
-                extra_headers["HTTP-Referer"] = model_info['additional_kwargs']['http_referer']
-            if 'x_title' in model_info['additional_kwargs']:
-                extra_headers["X-Title"] = model_info['additional_kwargs']['x_title']
-        
-        # Set up extra body parameters for OpenRouter
-        extra_body = {}
-        if 'additional_kwargs' in model_info:
-            # Add reasoning parameter support
-            if 'reasoning' in model_info['additional_kwargs']:
-                extra_body['reasoning'] = model_info['additional_kwargs']['reasoning']
-                logging.info(Fore.CYAN + f"Using OpenRouter reasoning parameter: {extra_body['reasoning']}")
-            
-            # Add provider if specified
-            if 'provider' in model_info['additional_kwargs']:
-                extra_body['provider'] = model_info['additional_kwargs']['provider']
-            
-            # Add models array if specified
-            if 'models' in model_info['additional_kwargs']:
-                extra_body['models'] = model_info['additional_kwargs']['models']
-            
-            # Add any other OpenRouter-specific parameters
-            for param in ['routes', 'transforms', 'stream_options']:
-                if param in model_info['additional_kwargs']:
-                    extra_body[param] = model_info['additional_kwargs'][param]
-        
+
+        # Assemble extra headers and body parameters from the key tables
+        extra_headers = {
+            header: additional_kwargs[key]
+            for key, header in _OR_HEADER_KEYS.items()
+            if key in additional_kwargs
+        }
+        extra_body = {
+            key: additional_kwargs[key]
+            for key in _OR_BODY_KEYS & additional_kwargs.keys()
+        }
+        if 'reasoning' in extra_body:
+            logging.info(Fore.CYAN + f"Using OpenRouter reasoning parameter: {extra_body['reasoning']}")
+
         # Add extra parameters to merged_params
         if extra_headers:
             merged_params['extra_headers'] = extra_headers
         if extra_body:
             merged_params['extra_body'] = extra_body
-        
-        # Use the client directly with OpenRouter base URL
-        while retries < max_retries:
-            try:
-                if debug:
-                    logging.info(Fore.BLUE + f"OpenRouter request params: {json.dumps(merged_params, default=str, ensure_ascii=False)}")
-                
-                # Use the OpenAI client to make the request
-                response = client.beta.chat.completions.parse(**merged_params)
-                
-                # Check if we have a valid message content
-                if not response.choices or not response.choices[0].message.content:
-                    logging.info(Fore.YELLOW + "Message content is empty, resending request...")
-                    retries += 1
-                    continue
-                
-                return response
-                
-            except Exception as e:
-                logging.error(Fore.RED + f"OpenRouter request exception: {str(e)}")
-                retries += 1
-        
-        logging.error(Fore.RED + "Unable to get a valid OpenRouter response after maximum retries.")
-        return None
-    
-    # Other providers use standard OpenAI client
-    else:
-        while retries < max_retries:            
-            response = client.beta.chat.completions.parse(**request_params)
-            message = response.choices[0].message
-
-            if message.content:
-                return response
+
+    # Cache only requests that are deterministic (or explicitly opted in)
+    use_cache = (
+        merged_params.get('temperature') == 0
+        or bool(model_info and model_info.get('cache'))
+    )
+    cache_key = None
+    if use_cache:
+        cache_key = _response_cache_key(merged_params)
+        with _RESPONSE_CACHE_LOCK:
+            cached = _RESPONSE_CACHE.get(cache_key)
+            if cached is not None:
+                _RESPONSE_CACHE.move_to_end(cache_key)
+                return cached
+
+    response = _do_parse(client, merged_params, max_retries, debug=debug)
+
+    if response is not None and cache_key is not None:
+        with _RESPONSE_CACHE_LOCK:
+            _RESPONSE_CACHE[cache_key] = response
+            _RESPONSE_CACHE.move_to_end(cache_key)
+            while len(_RESPONSE_CACHE) > _RESPONSE_CACHE_MAX:
+                _RESPONSE_CACHE.popitem(last=False)
+    return response
+
+
+def _do_parse(client, merged_params, max_retries, debug=False):
+    """Shared retry harness for reliable_parse.
+
+    Retries transient provider errors with exponential backoff + jitter,
+    fails fast on unrecoverable ones (auth, malformed request), and
+    re-sends when the model returns an empty message.
+    """
+    Fore = _get_fore()
+    retryable, fatal = _retry_error_classes()
+
+    # merged_params is invariant across retries; _LazyRepr serializes it
+    # at most once, and only if a handler actually formats the record
+    debug_repr = _LazyRepr(merged_params) if debug else None
+
+    # range() drives the attempt count; no manual counter to keep in
+    # sync across the retry paths
+    for attempt in range(max_retries):
+        try:
+            if debug:
+                logging.info(Fore.BLUE + "Request params: %s", debug_repr)
+
+            response = client.beta.chat.completions.parse(**merged_params)
+        except fatal as e:
+            logging.error(Fore.RED + f"Unrecoverable request error, not retrying: {e}")
+            return None
+        except retryable as e:
+            if attempt + 1 < max_retries:
+                delay = _backoff_delay(attempt)
+                logging.error(Fore.RED + f"Transient request error: {e}; retrying in {delay:.1f}s")
+                time.sleep(delay)
             else:
-                logging.info(Fore.YELLOW + "The message content is null or empty, re-running the request...")
-                retries += 1
+                logging.error(Fore.RED + f"Transient request error: {e}")
+            continue
+
+        # Check if we have a valid message content
+        if response.choices and response.choices[0].message.content:
+            return response
+
+        logging.info(Fore.YELLOW + "The message content is null or empty, re-running the request...")
+
+    logging.error(Fore.RED + "Failed to get a valid response after maximum retries.")
+    return None
+
+
+def normalize_clients(clients):
+    """
+    Normalize the (client, info) pairs produced at client initialization so
+    info is always a dict. Doing this once here lets the per-turn chat path
+    drop its defensive isinstance/coercion check.
+
+    :param clients: List of (client, info) pairs
+    :return: The list with every info coerced to a dict
+    """
+    normalized = []
+    for client, info in clients:
+        if not isinstance(info, dict):
+            info = dict(info)
+        # Interned model names make downstream membership tests resolve by
+        # pointer comparison
+        if isinstance(info.get('model_name'), str):
+            info['model_name'] = sys.intern(info['model_name'])
+        normalized.append((client, info))
+    return normalized
+
+
+# Explicit conversions a template field may carry ({x!r} etc.)
+_FIELD_CONVERSIONS = {'s': str, 'r': repr, 'a': ascii}
+
+
+@functools.lru_cache(maxsize=256)
+def compile_template(template_str):
+    """
+    Pre-parse a format template into a flat segment list and return a
+    renderer. Even indices hold static text (with {{ }} escapes already
+    resolved and adjacent runs merged), odd indices hold field names, so
+    each render only fills the variable slots and joins - no brace
+    re-scan and no per-part string concatenation. Fields carrying a
+    format spec or conversion keep them and render through format(), so
+    output matches str.format; nested fields inside a spec (rare, and
+    unused here) are rejected at compile time rather than mis-rendered.
+
+    :param template_str: The template string with {field} placeholders
+    :return: A callable mapping a kwargs dict to the rendered string
+    """
+    segments = ['']
+    for literal, field_name, format_spec, conversion in string.Formatter().parse(template_str):
+        # Formatter.parse splits literal runs at every {{ }} escape;
+        # folding them back together keeps the segment list minimal
+        segments[-1] += literal
+        if field_name is not None:
+            if format_spec and '{' in format_spec:
+                raise ValueError(
+                    f"compile_template does not support nested fields in format specs: {format_spec!r}"
+                )
+            if conversion is not None and conversion not in _FIELD_CONVERSIONS:
+                raise ValueError(f"Unknown conversion specifier {conversion!r}")
+            if format_spec or conversion:
+                # Slow slot: (name, spec, converter-or-None)
+                segments.append((field_name, format_spec or '',
+                                 _FIELD_CONVERSIONS.get(conversion)))
+            else:
+                segments.append(field_name)
+            segments.append('')
+
+    def render(kwargs, _segments=segments):
+        out = list(_segments)
+        for i in range(1, len(out), 2):
+            field = out[i]
+            if type(field) is str:
+                out[i] = str(kwargs[field])
+            else:
+                name, spec, convert = field
+                value = kwargs[name]
+                if convert is not None:
+                    value = convert(value)
+                out[i] = format(value, spec)
+        return ''.join(out)
+
+    return render
+
+
+class _SafeDict(dict):
+    """format_map mapping that leaves unknown placeholders intact."""
 
-        logging.error(Fore.RED + "Failed to get a valid response after maximum retries.")
-        return None
+    def __missing__(self, key):
+        return '{' + key + '}'
 
 
 def safe_format(template_str, **kwargs):
     """
     Safely format a string, preserving original placeholders if parameters are missing
     """
-    class SafeDict(dict):
-        def __missing__(self, key):
-            return '{' + key + '}'
-    
+    # _SafeDict covers missing keys, but format_map still raises on
+    # malformed templates (stray braces, bad specs) - keep the old
+    # return-as-is fallback for those
     try:
-        return template_str.format_map(SafeDict(kwargs))
-    except Exception:
+        return template_str.format_map(_SafeDict(kwargs))
+    except (ValueError, IndexError, KeyError):
         return template_str
 
 
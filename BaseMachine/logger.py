@@ -3,14 +3,82 @@ Unified Logging System for WorkFlow Framework
 Provides consistent logging configuration across all modules.
 """
 
+import functools
 import logging
+import os
+import re
 import sys
+import threading
 from datetime import datetime
 from pathlib import Path
-from colorama import Fore, Style, init
 
-# Initialize colorama for cross-platform colored output
-init(autoreset=True)
+# Only emit ANSI color when stdout is a real terminal and the user
+# hasn't opted out (https://no-color.org/); redirected/CI output stays
+# plain and colorama never loads
+_USE_COLOR = sys.stdout.isatty() and os.environ.get('NO_COLOR') is None
+
+if _USE_COLOR:
+    from colorama import Fore, Style, init
+
+    # Initialize colorama for cross-platform colored output (autoreset
+    # also closes the colors the step helpers leave open per line)
+    init(autoreset=True)
+else:
+    class _NoColor:
+        """Stands in for colorama's Fore/Style with empty strings."""
+
+        def __getattr__(self, name):
+            return ''
+
+    Fore = Style = _NoColor()
+
+# ANSI escape sequences plus the emoji the step helpers bake into their
+# messages (with one trailing space); stripped on the file-handler path
+_ANSI_OR_EMOJI_RE = re.compile(r'\x1b\[[0-9;]*m|[☀-➿\U0001f300-\U0001faff] ?')
+
+
+class _LazyFileHandler(logging.FileHandler):
+    """File handler that touches the filesystem only on first emit.
+
+    Directory creation and the open() are deferred, so processes that
+    import the logger but never log don't leave empty workflow_*.log
+    files behind. Writes go through a 64 KiB buffer and are only forced
+    to disk for ERROR and above (plus on close), cutting write syscalls
+    for high-volume INFO logging.
+    """
+
+    def __init__(self, filename, encoding=None):
+        self._dir_ready = False
+        super().__init__(filename, encoding=encoding, delay=True)
+
+    def _open(self):
+        if not self._dir_ready:
+            Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+            self._dir_ready = True
+        return open(self.baseFilename, self.mode,
+                    buffering=64 * 1024, encoding=self.encoding)
+
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            if record.levelno >= logging.ERROR:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+
+class _PlainFileFormatter(logging.Formatter):
+    """Formatter for file output that strips ANSI codes and emoji.
+
+    The step-logging helpers embed colors and emoji directly in the
+    message string for the console; writing those bytes to disk inflates
+    the log files and slows every emit, so the file path scrubs them.
+    """
+
+    def format(self, record):
+        return _ANSI_OR_EMOJI_RE.sub('', super().format(record))
 
 
 class ColoredFormatter(logging.Formatter):
@@ -23,20 +91,55 @@ class ColoredFormatter(logging.Formatter):
         'ERROR': Fore.RED,
         'CRITICAL': Fore.MAGENTA + Style.BRIGHT,
     }
-    
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Colored level names are invariant per level; build them once
+        # rather than re-assembling f-strings for every record
+        self._colored_levels = {
+            level: f"{color}{level}{Style.RESET_ALL}"
+            for level, color in self.COLORS.items()
+        }
+        self._color_module = functools.lru_cache(maxsize=128)(
+            lambda module: f"{Fore.CYAN}{module}{Style.RESET_ALL}"
+        )
+
     def format(self, record):
         """Format log record with color coding."""
+        if not _USE_COLOR:
+            return super().format(record)
+
+        # Colorize a copy: mutating the shared record would leak ANSI
+        # sequences into every other handler (notably the file handler)
+        record = logging.makeLogRecord(record.__dict__)
+
         # Add color to level name
-        level_color = self.COLORS.get(record.levelname, '')
-        record.levelname = f"{level_color}{record.levelname}{Style.RESET_ALL}"
-        
+        record.levelname = self._colored_levels.get(record.levelname, record.levelname)
+
         # Add color to module name for better readability
         if hasattr(record, 'module'):
-            record.module = f"{Fore.CYAN}{record.module}{Style.RESET_ALL}"
-        
+            record.module = self._color_module(record.module)
+
         return super().format(record)
 
 
+# Module-level sentinel checked by get_logger's hot path: one bool load
+# instead of re-entering the singleton constructor on every call
+_LOGGER_READY = False
+_logger_init_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=256)
+def _clean_logger_name(name):
+    """Shorten module-path logger names; cached so the prefix munging
+    runs once per distinct name instead of on every get_logger call."""
+    if name.startswith('WorkflowTemplate.'):
+        return name.replace('WorkflowTemplate.', 'WF.')
+    if name.startswith('BaseMachine.'):
+        return name.replace('BaseMachine.', 'BM.')
+    return name
+
+
 class WorkflowLogger:
     """
     Unified logger for the workflow framework.
@@ -54,11 +157,18 @@ class WorkflowLogger:
     
     def __init__(self):
         """Initialize the logger configuration."""
+        global _LOGGER_READY
         if self._initialized:
             return
-        
-        self._setup_logging()
-        self._initialized = True
+
+        with _logger_init_lock:
+            # Re-check under the lock so concurrent first callers don't
+            # both install handlers
+            if self._initialized:
+                return
+            self._setup_logging()
+            WorkflowLogger._initialized = True
+            _LOGGER_READY = True
     
     def _setup_logging(self):
         """Setup the unified logging configuration."""
@@ -98,22 +208,19 @@ class WorkflowLogger:
     def _setup_file_logging(self):
         """Setup file logging for persistent logs."""
         try:
-            # Create logs directory if it doesn't exist
-            log_dir = Path('logs')
-            log_dir.mkdir(exist_ok=True)
-            
-            # Create file handler with timestamp
+            # Create file handler with timestamp; the logs directory and
+            # the file itself are only created on the first emit
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            log_file = log_dir / f'workflow_{timestamp}.log'
-            
-            file_handler = logging.FileHandler(log_file, encoding='utf-8')
+            log_file = Path('logs') / f'workflow_{timestamp}.log'
+
+            file_handler = _LazyFileHandler(log_file, encoding='utf-8')
             file_handler.setLevel(logging.DEBUG)  # File logs can be more verbose
             
             # Create plain formatter for file (no colors)
             file_format = (
                 '[%(asctime)s] [%(name)s] [%(levelname)s] %(message)s'
             )
-            file_formatter = logging.Formatter(
+            file_formatter = _PlainFileFormatter(
                 file_format,
                 datefmt='%Y-%m-%d %H:%M:%S'
             )
@@ -137,19 +244,15 @@ class WorkflowLogger:
         Returns:
             Configured logger instance
         """
-        # Ensure the unified logger is initialized
-        WorkflowLogger()
-        
+        # Ensure the unified logger is initialized; once it is, this is
+        # a single module-global bool check
+        if not _LOGGER_READY:
+            WorkflowLogger()
+
         if name is None:
             name = 'workflow'
-        
-        # Clean up the name for better readability
-        if name.startswith('WorkflowTemplate.'):
-            name = name.replace('WorkflowTemplate.', 'WF.')
-        elif name.startswith('BaseMachine.'):
-            name = name.replace('BaseMachine.', 'BM.')
-        
-        return logging.getLogger(name)
+
+        return logging.getLogger(_clean_logger_name(name))
     
     @staticmethod
     def log_step_start(step_name, description=""):
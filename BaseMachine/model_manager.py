@@ -1,23 +1,147 @@
 import os
-import json
 from typing import Dict, Any
-from openai import OpenAI, AzureOpenAI
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    import json
+    _loads = json.loads
+
+from BaseMachine.llm_helpers import normalize_clients
+
+# Parsed config cache keyed by path; entries carry the file's mtime so a
+# touched config is re-read while repeat ModelManager constructions (one
+# per state machine/worker) skip the open+parse entirely
+_CONFIG_CACHE: Dict[str, tuple] = {}
+
+
+def _load_json_cached(path: str) -> Dict[str, Any]:
+    mtime_ns = os.stat(path).st_mtime_ns
+    cached = _CONFIG_CACHE.get(path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    with open(path, 'rb') as f:
+        data = _loads(f.read())
+    _CONFIG_CACHE[path] = (mtime_ns, data)
+    return data
+
+
+def _azure_client(config, model_info, provider_config):
+    key = ('azure', config['azure_endpoint'], model_info['api_version'])
+
+    def factory():
+        from openai import AzureOpenAI
+        return AzureOpenAI(
+            api_key=config['azure_key'],
+            api_version=model_info['api_version'],
+            azure_endpoint=config['azure_endpoint']
+        )
+    return key, factory
+
+
+def _siliconflow_client(config, model_info, provider_config):
+    key = ('siliconflow', provider_config['base_url'])
+
+    def factory():
+        from openai import OpenAI
+        return OpenAI(
+            api_key=config['siliconflow_key'],
+            base_url=provider_config['base_url']
+        )
+    return key, factory
+
+
+def _azure_deepseek_client(config, model_info, provider_config):
+    key = ('azure-deepseek', config['ds_azure_endpoint'], model_info['api_version'])
+
+    def factory():
+        from openai import AzureOpenAI
+        return AzureOpenAI(
+            api_key=config['ds_azure_key'],
+            api_version=model_info['api_version'],
+            azure_endpoint=config['ds_azure_endpoint']
+        )
+    return key, factory
+
+
+def _openrouter_client(config, model_info, provider_config):
+    # Only add API key to model_info, without site information
+    model_info['openrouter_api_key'] = config['openrouter_api_key']
+    key = ('openrouter', 'https://openrouter.ai/api/v1')
+
+    def factory():
+        from openai import OpenAI
+        return OpenAI(
+            api_key=config['openrouter_api_key'],
+            base_url='https://openrouter.ai/api/v1'
+        )
+    return key, factory
+
+
+def _openai_client(config, model_info, provider_config):
+    key = ('openai', provider_config.get('base_url'))
+
+    def factory():
+        from openai import OpenAI
+        return OpenAI(
+            api_key=config['api_key'],
+            base_url=provider_config.get('base_url')
+        )
+    return key, factory
+
+
+# OpenRouter provider-routing preferences: config key -> request key
+_OR_ROUTE_RENAMES = {
+    'order': 'order',
+    'allow_fallbacks': 'allow_fallbacks',
+    'sort': 'sort',
+    'ignore': 'skip',
+    'require_parameters': 'filterParams',
+    'data_collection': 'data_collection',
+    'quantizations': 'quantizations',
+}
+
+# Provider name -> builder returning (share_key, client_factory); one
+# dict lookup replaces the old five-way if/elif chain per model
+_CLIENT_BUILDERS = {
+    'azure': _azure_client,
+    'siliconflow': _siliconflow_client,
+    'azure-deepseek': _azure_deepseek_client,
+    'openrouter': _openrouter_client,
+    'openai': _openai_client,
+}
+
 
 class ModelManager:
     def __init__(self, config_dir: str):
         self.config_dir = config_dir
         self.model_config = self._load_model_config()
         self.config = self._load_main_config()
-        
+        # Per-model (client, model_info) pairs built on first access, and
+        # provider-level clients keyed by endpoint so models sharing a
+        # provider share one SDK client and its httpx connection pool
+        self._clients: Dict[str, tuple] = {}
+        self._provider_clients: Dict[tuple, Any] = {}
+        # Fail fast on missing credentials for every provider the config
+        # actually uses, instead of re-checking per model on each init
+        self._validate_credentials()
+
+    def _validate_credentials(self):
+        used_providers = {
+            info['provider'] for info in self.model_config.get('models', {}).values()
+        }
+        provider_configs = self.model_config.get('provider_configs', {})
+        for provider in used_providers:
+            for required_key in provider_configs.get(provider, {}).get('requires', []):
+                if not self.config.get(required_key):
+                    raise ValueError(f"Missing required credential: {required_key}")
+
     def _load_model_config(self) -> Dict[str, Any]:
-        model_config_path = os.path.join(self.config_dir, 'model_config.json')
-        with open(model_config_path, 'r') as f:
-            return json.load(f)
-            
+        return _load_json_cached(os.path.join(self.config_dir, 'model_config.json'))
+
     def _load_main_config(self) -> Dict[str, Any]:
-        config_path = os.path.join(self.config_dir, 'config.json')
-        with open(config_path, 'r') as f:
-            return json.load(f)
+        return _load_json_cached(os.path.join(self.config_dir, 'config.json'))
             
     def get_available_models(self):
         """Return list of available models with their descriptions"""
@@ -29,63 +153,63 @@ class ModelManager:
             for model_id, info in self.model_config["models"].items()
         }
         
-    def initialize_client(self):
-        """Initialize and return a list of all model clients based on model_config."""
-        clients = []
-        for model_id, model_info in self.model_config['models'].items():
-            provider = model_info['provider']
-            provider_config = self.model_config['provider_configs'][provider]
+    def _shared_client(self, key, factory):
+        """Return the provider client for key, constructing it once."""
+        client = self._provider_clients.get(key)
+        if client is None:
+            client = factory()
+            self._provider_clients[key] = client
+        return client
 
-            # Verify required credentials are present
-            for required_key in provider_config.get('requires', []):
-                if not self.config.get(required_key):
-                    raise ValueError(f"Missing required credential: {required_key}")
+    def get_client(self, model_id):
+        """Build (client, model_info) for one model, lazily and cached.
 
-            # Add 'name' to model_info for easy access
-            model_info['name'] = model_id
-
-            # Initialize appropriate client
-            if provider == 'azure':
-                client = AzureOpenAI(
-                    api_key=self.config['azure_key'],
-                    api_version=model_info['api_version'],
-                    azure_endpoint=self.config['azure_endpoint']
-                )
-            elif provider == 'siliconflow':
-                client = OpenAI(
-                    api_key=self.config['siliconflow_key'],
-                    base_url=provider_config['base_url']
-                )
-            elif provider == 'azure-deepseek':
-                client = AzureOpenAI(
-                    api_key=self.config['ds_azure_key'],
-                    api_version=model_info['api_version'],
-                    azure_endpoint=self.config['ds_azure_endpoint']
-                )
-            elif provider == 'openrouter':
-                # OpenRouter integration with API version
-                client = OpenAI(
-                    api_key=self.config['openrouter_api_key'],
-                    base_url='https://openrouter.ai/api/v1'
-                )
-                # Only add API key to model_info, without site information
-                model_info['openrouter_api_key'] = self.config['openrouter_api_key']
-                
-            else:  # openai
-                client = OpenAI(
-                    api_key=self.config['api_key'],
-                    base_url=provider_config.get('base_url')
-                )
-            
-            # Store completion kwargs in model_info
-            model_info = self.get_completion_kwargs(model_info)
+        Clients do TLS setup and allocate connection pools, so nothing is
+        constructed until a model is actually requested, and models that
+        point at the same provider endpoint share one client.
+        """
+        cached = self._clients.get(model_id)
+        if cached is not None:
+            return cached
+
+        # Work on a copy so per-client annotations below never leak
+        # back into the (now shared, cached) parsed config
+        model_info = dict(self.model_config['models'][model_id])
+        provider = model_info['provider']
+        provider_config = self.model_config['provider_configs'][provider]
+
+        # Add 'name' to model_info for easy access
+        model_info['name'] = model_id
+
+        # Initialize appropriate client via the builder table (openai
+        # semantics for unknown providers, as with the old else branch).
+        # The builders import the openai SDK lazily inside their factories
+        build = _CLIENT_BUILDERS.get(provider, _openai_client)
+        share_key, factory = build(self.config, model_info, provider_config)
+        client = self._shared_client(share_key, factory)
+
+        # Store completion kwargs in model_info
+        model_info = self.get_completion_kwargs(model_info)
 
-            clients.append((client, model_info))
+        entry = (client, model_info)
+        self._clients[model_id] = entry
+        return entry
 
-        return clients
+    def initialize_client(self):
+        """Initialize and return a list of all model clients based on model_config."""
+        clients = [self.get_client(model_id) for model_id in self.model_config['models']]
+
+        # Guarantee info is always a dict so per-turn consumers can index
+        # it without defensive coercion
+        return normalize_clients(clients)
         
     def get_completion_kwargs(self, model_info):
-        """Get kwargs for completion API call based on selected model"""
+        """Get kwargs for completion API call based on selected model.
+
+        Returns a new dict carrying 'additional_kwargs'; the input
+        model_info is never mutated, so repeated calls can't compound
+        nested state into shared or cached config entries.
+        """
 
         provider = model_info.get("provider")
         
@@ -115,34 +239,16 @@ class ModelManager:
             if "api_version" in model_info:
                 kwargs["openrouter_version"] = model_info["api_version"]
             
-            # Add OpenRouter provider routing parameters if specified
+            # Add OpenRouter provider routing parameters if specified,
+            # mapping preference keys via the rename table
             if "openrouter_provider" in model_info:
-                # Add provider preferences to request
-                routing_params = {}
                 provider_config = model_info["openrouter_provider"]
-                
-                # Map provider preferences to OpenRouter parameters
-                if "order" in provider_config:
-                    routing_params["order"] = provider_config["order"]
-                
-                if "allow_fallbacks" in provider_config:
-                    routing_params["allow_fallbacks"] = provider_config["allow_fallbacks"]
-                    
-                if "sort" in provider_config:
-                    routing_params["sort"] = provider_config["sort"]
-                    
-                if "ignore" in provider_config:
-                    routing_params["skip"] = provider_config["ignore"]
-                    
-                if "require_parameters" in provider_config:
-                    routing_params["filterParams"] = provider_config["require_parameters"]
-                    
-                if "data_collection" in provider_config:
-                    routing_params["data_collection"] = provider_config["data_collection"]
-                
-                if "quantizations" in provider_config:
-                    routing_params["quantizations"] = provider_config["quantizations"]
-                
+                routing_params = {
+                    dst: provider_config[src]
+                    for src, dst in _OR_ROUTE_RENAMES.items()
+                    if src in provider_config
+                }
+
                 # Add provider parameters directly to the request body
                 if routing_params:
                     kwargs["provider"] = routing_params
@@ -153,6 +259,5 @@ class ModelManager:
                 # This way it can be used directly in reliable_parse
                 kwargs["reasoning"] = model_info["reasoning"]
         
-        # Store the kwargs in model_info's additional_kwargs parameter instead of returning them
-        model_info["additional_kwargs"] = kwargs
-        return model_info 
\ No newline at end of file
+        # Attach the kwargs under 'additional_kwargs' on a fresh copy
+        return {**model_info, "additional_kwargs": kwargs} 
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Prompt Layout Module
+Helpers that keep message lists byte-stable across calls so provider-side
+prefix (KV) caches match on repeated turns. The longer the common prefix
+between two requests, the more cached tokens the provider can reuse.
+"""
+
+import json
+import re
+
+# Collapse runs of spaces/tabs that would otherwise make two semantically
+# identical system prompts differ byte-wise
+_WHITESPACE_RUN = re.compile(r'[ \t]+')
+
+
+def canonicalize_content(content, normalize_whitespace=False):
+    """
+    Produce a stable rendering of a message's content.
+
+    Dict/list contents are serialized with sorted keys so the same data
+    always yields the same bytes. String contents are returned verbatim
+    unless normalize_whitespace is set (user turns often embed code, where
+    collapsing indentation would mangle the snippet).
+    """
+    if isinstance(content, str):
+        if normalize_whitespace:
+            return _WHITESPACE_RUN.sub(' ', content)
+        return content
+    return json.dumps(content, sort_keys=True, default=str)
+
+
+def canonicalize_messages(messages):
+    """
+    Rewrite a message list into a cache-friendly layout: system messages
+    (the stable prefix) first and in original relative order, followed by
+    the remaining turns. System content gets whitespace-normalized;
+    structured contents are serialized deterministically.
+    """
+    system_messages = []
+    other_messages = []
+    for message in messages:
+        if message.get('role') == 'system':
+            system_messages.append({
+                **message,
+                'content': canonicalize_content(message.get('content', ''), normalize_whitespace=True)
+            })
+        else:
+            other_messages.append({
+                **message,
+                'content': canonicalize_content(message.get('content', ''))
+            })
+    return system_messages + other_messages
@@ -1,21 +1,122 @@
 # statemachine.py
 
+import dataclasses
+import inspect
 import os
 import sys
+import traceback
+from collections import deque
 from typing import Any, Callable, Dict, Tuple
 import logging
 
+logger = logging.getLogger(__name__)
+
+# ANSI constants for the error paths
+_RED = '\033[91m'
+_GRAY = '\033[90m'
+_RST = '\033[0m'
+
+# Pre-assembled %-style error templates: the logging framework only
+# builds the final string when a handler actually emits the record
+_LIMIT_TMPL = _RED + "Claude AI usage limit reached in state '%s'" + _RST
+_RUNTIME_ERR_TMPL = _RED + "Runtime error in state '%s': %s" + _RST
+_ERR_TMPL = _RED + "Error in state '%s': %s" + _RST
+_TB_TMPL = _GRAY + "%s" + _RST
+
 # Import configuration loading function
 from BaseMachine.config_loader import load_config
 from BaseMachine.model_manager import ModelManager
 
-from openai import OpenAI
-from openai import AzureOpenAI
+# ModelManager instances shared per config directory: every StateMachine
+# pointing at the same config reuses the same provider SDK clients and
+# their pooled HTTP connections, instead of paying SSL-context setup and
+# fresh TLS handshakes per construction
+_MODEL_MANAGERS: Dict[str, ModelManager] = {}
+
+
+def _get_model_manager(config_dir: str) -> ModelManager:
+    config_dir = os.path.abspath(config_dir)
+    manager = _MODEL_MANAGERS.get(config_dir)
+    if manager is None:
+        manager = ModelManager(config_dir)
+        _MODEL_MANAGERS[config_dir] = manager
+    return manager
+
+
+def close_all_clients():
+    """Close every cached provider client and drop the shared managers.
+
+    Intended for process shutdown; safe to call more than once.
+    """
+    for manager in _MODEL_MANAGERS.values():
+        for client in manager._provider_clients.values():
+            close = getattr(client, 'close', None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+        manager._provider_clients.clear()
+        manager._clients.clear()
+    _MODEL_MANAGERS.clear()
+
 
-# Add utils directory to system path (as needed)
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+# Parsed chatGPTConfig objects keyed by absolute path; entries carry the
+# file mtime so an edited config is re-read while repeat StateMachine
+# constructions skip the load entirely
+_PARSED_CONFIG_CACHE: Dict[str, Tuple[float, Any]] = {}
+
+# Default config locations, resolved once at import instead of being
+# re-joined on every StateMachine construction
+_DEFAULT_CONFIG_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '.config', 'config.json'))
+_DEFAULT_CONFIG_DIR = os.path.dirname(_DEFAULT_CONFIG_PATH)
+
+# Caps for the per-machine history buffers: appends stay O(1) and memory
+# stays bounded on long agent sessions instead of growing without limit
+AGENT_RESULTS_MAXLEN = 10000
+HYBRID_HISTORY_MAXLEN = 10000
+
+# Shared empty-kwargs sentinel; never mutated, so transitions that carry
+# no arguments don't allocate a fresh dict each step
+_EMPTY_ARGS: Dict[str, Any] = {}
+
+def _normalize_transition(fn):
+    """Wrap a next_state_func so it always returns (target, args).
+
+    Normalizing once at state-construction time lets the dispatch loop
+    unpack unconditionally instead of re-branching on tuple-vs-str for
+    every transition.
+    """
+    def normalized(result, machine, _fn=fn):
+        out = _fn(result, machine)
+        if type(out) is tuple:
+            if len(out) == 2:
+                return out
+            return out[0], (out[1] if len(out) > 1 else _EMPTY_ARGS)
+        return out, _EMPTY_ARGS
+    return normalized
+
+
+# Entry kinds for the columnar analysis buffers (see StateMachine.append_analysis)
+ANALYSIS_PROMPT = 0
+ANALYSIS_RESULT = 1
+ANALYSIS_BOTH = 2
+ANALYSIS_SUB = 3
 
 class BaseState:
+    """One node in a StateMachine's state table.
+
+    State names are interned at registration; next_state_func
+    implementations that build target names dynamically can sys.intern()
+    them too so the per-transition lookup compares by pointer identity.
+    """
+
+    # No per-instance __dict__: the dispatch loop dereferences these
+    # attributes back-to-back, and slots keep them compact
+    __slots__ = ('name', 'action', 'next_state_func', '_takes_kwargs', 'is_terminal',
+                 '_is_async')
+
     def __init__(
         self,
         name: str,
@@ -25,6 +126,19 @@ class BaseState:
         self.name = name
         self.action = action
         self.next_state_func = next_state_func
+        # Cached arity check: does the action take anything beyond the
+        # machine (positional params or **kwargs)? Resolved once here so
+        # the dispatch loop doesn't re-read __code__ per transition.
+        # 0x08 is CO_VARKEYWORDS.
+        code = getattr(action, '__code__', None)
+        self._takes_kwargs = (
+            code is None or code.co_argcount > 1 or bool(code.co_flags & 0x08)
+        )
+        # Flag read by the dispatch loop in place of an isinstance check
+        self.is_terminal = False
+        # Resolved once so process_async doesn't iscoroutine-check the
+        # result of every action in the steady state
+        self._is_async = inspect.iscoroutinefunction(action)
 
     def process(self, machine: 'StateMachine', **kwargs):
         # Execute action, pass in machine and optional parameters, get result
@@ -34,8 +148,11 @@ class BaseState:
         return next_state_info, result  # Return next state info and result
 
 class ExitState(BaseState):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(name="Exit", action=lambda machine: None)
+        self.is_terminal = True
 
     def process(self, machine, **kwargs):
         pass  # Exit state, no processing needed
@@ -47,25 +164,23 @@ class StateMachine:
         self.unified_config = unified_config
         self.mode = mode  # 'chat', 'agent', 'hybrid', or 'action'
         self.require_models = require_models
-        self.cwd = cwd or os.getcwd()  # Use provided cwd or current working directory
-        
-        # Change to the specified working directory if provided
-        if cwd and os.path.isdir(cwd):
-            self.original_cwd = os.getcwd()
-            os.chdir(self.cwd)
-        else:
-            self.original_cwd = None
-        
+        # Working directory is carried as state for actions to use
+        # (subprocess cwd=, os.path.join) rather than applied with
+        # os.chdir: chdir is process-global, so it raced between
+        # concurrently constructed machines
+        self.cwd = cwd or os.getcwd()
+
+
         # Initialize model manager only if needed
         if self.require_models and mode != 'action':
-            config_dir = os.path.dirname(config_path) if config_path else os.path.join(os.path.dirname(__file__), '../.config')
-            self.model_manager = ModelManager(config_dir)
+            config_dir = os.path.dirname(config_path) if config_path else _DEFAULT_CONFIG_DIR
+            self.model_manager = _get_model_manager(config_dir)
         else:
             self.model_manager = None
         
         # Initialize agent-specific attributes
-        self.agent_results = []  # Store agent action results
-        self.hybrid_history = []  # Store hybrid mode history
+        self.agent_results = deque(maxlen=AGENT_RESULTS_MAXLEN)  # Store agent action results
+        self.hybrid_history = deque(maxlen=HYBRID_HISTORY_MAXLEN)  # Store hybrid mode history
 
         # # Test model 'create_success' functionality
         # self._test_model_create_success()
@@ -73,10 +188,29 @@ class StateMachine:
         # Load configuration
         self.config = self._load_config(config_path)
 
-        self.analysis_result = []
-        self.messages = getattr(self.context, 'messages', [])
-        self.total_input_tokens = 0
-        self.total_output_tokens = 0
+        # Analysis entries are stored column-wise (parallel lists) instead of
+        # one dict per entry: iterating only prompts or only results touches
+        # a single compact list, and serialization stays columnar. The
+        # analysis_result property provides the legacy row view.
+        self.analysis_kinds = []
+        self.analysis_prompts = []
+        self.analysis_outputs = []
+        # Alias the context's message list instead of snapshotting it:
+        # the machine and its context share one buffer, and the default
+        # [] is only allocated when the context has none
+        messages = getattr(self.context, 'messages', None)
+        if messages is None:
+            messages = []
+            try:
+                self.context.messages = messages
+            except Exception:
+                # Contexts with fixed fields (e.g. pydantic models that
+                # don't declare messages) simply don't get the alias
+                pass
+        self.messages = messages
+        # Token totals in one mutable [input, output] pair; the
+        # total_*_tokens properties keep existing += call sites working
+        self._token_totals = [0, 0]
 
         # Initialize all model clients only if model manager exists
         if self.model_manager:
@@ -86,87 +220,257 @@ class StateMachine:
 
         # Note: Client selection is handled by create_chat_action, not here.
 
-        # Create state instances
+        # Create state instances; one shared exit sentinel instead of a
+        # fresh ExitState allocation per unknown-transition miss
+        self._exit_state = ExitState()
         self.states = self._create_states(state_definitions)
+
+        # Jump-table view: dense integer ids over the state registry.
+        # next_state_func may return an id (see state_id) so the hot
+        # loop resolves transitions with one list index instead of a
+        # string hash lookup
+        self._state_list = list(self.states.values())
+        if self._exit_state not in self._state_list:
+            self._state_list.append(self._exit_state)
+        self._name_to_id = {name: i for i, name in enumerate(self.states)}
+        self._exit_id = self._state_list.index(self._exit_state)
+
         self.state = self.states.get(initial_state, None)
         if self.state is None:
             raise ValueError(f"Initial state '{initial_state}' is not defined in state_definitions.")
         
     def _load_config(self, config_path):
         if not config_path:
-            default_config_path = '../.config/config.json'
-            config_path = os.path.join(os.path.dirname(__file__), default_config_path)
+            config_path = _DEFAULT_CONFIG_PATH
+        else:
+            config_path = os.path.abspath(config_path)
+
+        # Re-parse only when the file changed; the frozen config object
+        # is shared as-is between machines
+        mtime = os.stat(config_path).st_mtime
+        cached = _PARSED_CONFIG_CACHE.get(config_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
         config = load_config(config_path)
-        config.config_path = config_path  # Set config_path attribute
+        # chatGPTConfig is frozen; attach the source path via replace
+        config = dataclasses.replace(config, config_path=config_path)
+        _PARSED_CONFIG_CACHE[config_path] = (mtime, config)
         return config
 
     def _create_states(self, state_definitions):
         states = {}
         for name, config in state_definitions.items():
+            # Interned keys let transition lookups short-circuit on
+            # pointer equality for names that are themselves interned
+            name = sys.intern(name)
             if name == "Exit":
-                states[name] = ExitState()
-            else:
-                states[name] = BaseState(
-                    name=name,
-                    action=config['action'],
-                    next_state_func=config.get("next_state_func", None),
-                )
+                states[name] = self._exit_state
+                continue
+
+            # Validate up front so misconfigured definitions fail at
+            # construction instead of mid-run inside the dispatch loop
+            action = config.get('action')
+            if not callable(action):
+                raise ValueError(f"State '{name}' is missing a callable 'action'")
+            next_state_func = config.get("next_state_func", None)
+            if next_state_func is not None and not callable(next_state_func):
+                raise ValueError(f"State '{name}' has a non-callable 'next_state_func'")
+
+            states[name] = BaseState(
+                name=name,
+                action=action,
+                next_state_func=(
+                    _normalize_transition(next_state_func)
+                    if next_state_func is not None else None
+                ),
+            )
+        # Fast membership view over the defined state names
+        self.state_names = frozenset(states)
         return states
 
+    def _resolve_transition(self, target):
+        """Map a normalized transition target (name, id, or state) to a
+        BaseState; unknown names fall back to the exit sentinel."""
+        if type(target) is str:
+            return self.states.get(target) or self._exit_state
+        if type(target) is int:
+            # Jump-table mode: a precomputed id (see state_id) resolves
+            # with a single indexed load
+            return self._state_list[target]
+        if isinstance(target, BaseState):
+            # Resolved-transition mode: the state object itself
+            return target
+        raise ValueError("next_state_func must return a string or a tuple (state_name, args_dict)")
+
     def process(self):
         previous_result = None  # Save the result of the previous action
-        extra_args = {}  # Store parameters to pass to the next action
+        extra_args = _EMPTY_ARGS  # Store parameters to pass to the next action
         while True:
             try:
-                if isinstance(self.state, ExitState) or self.state is None:
+                state = self.state
+                if state is None or state.is_terminal:
+                    self.flush_token_log()
                     return previous_result  # or self.analysis_result
                 else:
                     # Call action function, pass in machine and optional parameters
-                    action_func = self.state.action
+                    action_func = state.action
 
-                    # Get the parameter list of action_func
-                    args_spec = action_func.__code__.co_varnames
-                    if len(args_spec) > 1:
+                    if state._takes_kwargs and extra_args:
                         # There are other parameters besides 'machine'
-                        # Prepare parameters
-                        kwargs = extra_args if extra_args else {}
-                        result = action_func(self, **kwargs)
-                        extra_args = {}  # Clear extra_args
+                        result = action_func(self, **extra_args)
+                        extra_args = _EMPTY_ARGS  # Clear extra_args
                     else:
                         result = action_func(self)
 
-                    # Call next_state_func, may return next state name or (state name, parameter dict)
-                    next_state_info = self.state.next_state_func(result, self)
-                    if isinstance(next_state_info, tuple):
-                        next_state_name = next_state_info[0]
-                        extra_args = next_state_info[1] if len(next_state_info) > 1 else {}
-                        self.state = self.states.get(next_state_name, ExitState())
-                    elif isinstance(next_state_info, str):
-                        next_state_name = next_state_info
-                        self.state = self.states.get(next_state_name, ExitState())
-                        extra_args = {}
-                    else:
-                        raise ValueError("next_state_func must return a string or a tuple (state_name, args_dict)")
+                    # next_state_func is normalized at construction to
+                    # always return (target, args); unpack unconditionally
+                    next_target, extra_args = state.next_state_func(result, self)
+                    self.state = self._resolve_transition(next_target)
                     previous_result = result  # Update previous_result
             except RuntimeError as e:
                 # Check for Claude AI usage limit
                 if "Claude AI usage limit reached" in str(e):
-                    logging.error(f"\033[91mClaude AI usage limit reached in state '{self.state.name}'\033[0m")
+                    logger.error(_LIMIT_TMPL, self.state.name)
                     # Re-raise to let the caller handle it
                     raise
                 else:
-                    logging.error(f"\033[91mRuntime error in state '{self.state.name}': {e}\033[0m")
-                    import traceback
+                    logger.error(_RUNTIME_ERR_TMPL, self.state.name, e)
                     tb_str = ''.join(traceback.format_exception(None, e, e.__traceback__))
-                    logging.error(f"\033[90m{tb_str}\033[0m")
+                    logger.error(_TB_TMPL, tb_str)
                     break
             except Exception as e:
-                logging.error(f"\033[91mError in state '{self.state.name}': {e}\033[0m")
-                import traceback
+                logger.error(_ERR_TMPL, self.state.name, e)
                 tb_str = ''.join(traceback.format_exception(None, e, e.__traceback__))
-                logging.error(f"\033[90m{tb_str}\033[0m")
+                logger.error(_TB_TMPL, tb_str)
                 break
 
+    async def process_async(self):
+        """Async variant of process().
+
+        Actions defined as coroutine functions are awaited (detected once
+        per state at construction), so I/O-bound machines sharing an
+        event loop can interleave instead of blocking each other.
+        Synchronous actions run inline, matching process() semantics.
+        """
+        previous_result = None
+        extra_args = _EMPTY_ARGS
+        while True:
+            try:
+                state = self.state
+                if state is None or state.is_terminal:
+                    self.flush_token_log()
+                    return previous_result
+
+                action_func = state.action
+                if state._takes_kwargs and extra_args:
+                    result = action_func(self, **extra_args)
+                    extra_args = _EMPTY_ARGS
+                else:
+                    result = action_func(self)
+                if state._is_async:
+                    result = await result
+
+                next_target, extra_args = state.next_state_func(result, self)
+                self.state = self._resolve_transition(next_target)
+                previous_result = result
+            except RuntimeError as e:
+                if "Claude AI usage limit reached" in str(e):
+                    logger.error(_LIMIT_TMPL, self.state.name)
+                    raise
+                logger.error(_RUNTIME_ERR_TMPL, self.state.name, e)
+                logger.error(_TB_TMPL, ''.join(traceback.format_exception(None, e, e.__traceback__)))
+                break
+            except Exception as e:
+                logger.error(_ERR_TMPL, self.state.name, e)
+                logger.error(_TB_TMPL, ''.join(traceback.format_exception(None, e, e.__traceback__)))
+                break
+
+    def iter_transitions(self):
+        """Step the machine one transition at a time.
+
+        Yields (state_name, result) after each action so an outer
+        scheduler can interleave work between transitions; exceptions
+        propagate to the consumer instead of being swallowed here.
+        """
+        extra_args = _EMPTY_ARGS
+        while True:
+            state = self.state
+            if state is None or state.is_terminal:
+                self.flush_token_log()
+                return
+
+            action_func = state.action
+            if state._takes_kwargs and extra_args:
+                result = action_func(self, **extra_args)
+                extra_args = _EMPTY_ARGS
+            else:
+                result = action_func(self)
+
+            next_target, extra_args = state.next_state_func(result, self)
+            self.state = self._resolve_transition(next_target)
+            yield state.name, result
+
+    @property
+    def total_input_tokens(self):
+        return self._token_totals[0]
+
+    @total_input_tokens.setter
+    def total_input_tokens(self, value):
+        self._token_totals[0] = value
+
+    @property
+    def total_output_tokens(self):
+        return self._token_totals[1]
+
+    @total_output_tokens.setter
+    def total_output_tokens(self, value):
+        self._token_totals[1] = value
+
+    def flush_token_log(self):
+        """Emit one usage summary line instead of logging per call."""
+        input_tokens, output_tokens = self._token_totals
+        if input_tokens or output_tokens:
+            logger.info("Token usage: %d input / %d output", input_tokens, output_tokens)
+
+    def state_id(self, name):
+        """Dense integer id for a state name, for jump-table transitions.
+
+        A next_state_func may resolve names to ids once (e.g. at first
+        call) and return the id thereafter, avoiding the per-transition
+        string lookup. Unknown names map to the exit sentinel's id.
+        """
+        return self._name_to_id.get(name, self._exit_id)
+
+    def append_analysis(self, kind, prompt=None, result=None):
+        """Append one entry to the columnar analysis buffers."""
+        self.analysis_kinds.append(kind)
+        self.analysis_prompts.append(prompt)
+        self.analysis_outputs.append(result)
+
+    @property
+    def analysis_result(self):
+        """Legacy row view over the columnar analysis buffers."""
+        rows = []
+        for kind, prompt, result in zip(self.analysis_kinds, self.analysis_prompts, self.analysis_outputs):
+            if kind == ANALYSIS_PROMPT:
+                rows.append(prompt)
+            elif kind == ANALYSIS_RESULT:
+                rows.append(result)
+            elif kind == ANALYSIS_BOTH:
+                rows.append({'prompt': prompt, 'result': result})
+            else:
+                rows.append({'context': prompt, 'result': result})
+        return rows
+
+    def columnar_results(self):
+        """Columnar dump of the analysis buffers, cheap to serialize."""
+        return {
+            'kinds': self.analysis_kinds,
+            'prompts': self.analysis_prompts,
+            'results': self.analysis_outputs,
+        }
+
     def results(self):
         return self.analysis_result
 
@@ -2,10 +2,13 @@
 Context for QL Query Modification
 """
 
-import json
+import functools
 import os
 from datetime import datetime
 
+from QLWorkflow.util.fastjson import jdumps
+from QLWorkflow.util.logging_utils import append_interaction, read_interactions
+
 # Get the directory of the script for relative paths
 SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -29,7 +32,16 @@ class ModificationContext:
         self.cwe_number = cwe_number
         self.ql_file_path = ql_file_path
         self.current_iteration = current_iteration
-        self.query_name = query_name or (os.path.splitext(os.path.basename(ql_file_path))[0] if ql_file_path else None)
+        # Always resolve a query name here so downstream actions can read
+        # the attribute directly instead of guarding with hasattr
+        if query_name:
+            self.query_name = query_name
+        elif ql_file_path:
+            self.query_name = os.path.splitext(os.path.basename(ql_file_path))[0]
+        elif cwe_number is not None:
+            self.query_name = f"CWE-{cwe_number:03d}"
+        else:
+            self.query_name = None
         
         # Query content
         self.current_ql_content = None
@@ -54,11 +66,46 @@ class ModificationContext:
         # Logging
         self.interactions_log = []
         
-        # Load the original QL content
-        if ql_file_path and os.path.exists(ql_file_path):
-            with open(ql_file_path, 'r') as f:
-                self.current_ql_content = f.read()
+        # Load the original QL content. EAFP: open directly instead of a
+        # separate exists() stat; TypeError covers ql_file_path=None
+        try:
+            with open(ql_file_path, 'rb') as f:
+                self.current_ql_content = f.read().decode('utf-8', errors='replace')
+        except (FileNotFoundError, TypeError):
+            pass
     
+    @property
+    def current_iteration(self):
+        return self._current_iteration
+
+    @current_iteration.setter
+    def current_iteration(self, value):
+        self._current_iteration = value
+        # Drop the memoized per-iteration paths; they rebuild lazily
+        for cached in ('iteration_dir', 'reports_dir', 'query_results_dir'):
+            self.__dict__.pop(cached, None)
+
+    # Per-iteration directories, joined and created once per iteration
+    # instead of re-joining and re-stat'ing in every action
+
+    @functools.cached_property
+    def iteration_dir(self):
+        d = os.path.join(self.output_dir, f"iteration_{self.current_iteration}")
+        os.makedirs(d, exist_ok=True)
+        return d
+
+    @functools.cached_property
+    def reports_dir(self):
+        d = os.path.join(self.iteration_dir, 'reports')
+        os.makedirs(d, exist_ok=True)
+        return d
+
+    @functools.cached_property
+    def query_results_dir(self):
+        d = os.path.join(self.iteration_dir, 'query_results')
+        os.makedirs(d, exist_ok=True)
+        return d
+
     def log_interaction(self, action_type, request, response):
         """Log request and response for tracking."""
         interaction = {
@@ -70,32 +117,21 @@ class ModificationContext:
         }
         self.interactions_log.append(interaction)
         
-        # Save to main interactions log file
-        log_file = os.path.join(self.output_dir, 'interactions_log.json')
-        os.makedirs(os.path.dirname(log_file), exist_ok=True)
-        
-        # Load existing log if exists
-        existing_log = []
-        if os.path.exists(log_file):
-            with open(log_file, 'r') as f:
-                existing_log = json.load(f)
-        
-        # Append new interaction
-        existing_log.append(interaction)
-        
-        # Save updated log
-        with open(log_file, 'w') as f:
-            json.dump(existing_log, f, indent=2)
-        
-        # Also save to iteration-specific directory
-        iteration_dir = os.path.join(self.output_dir, f"iteration_{self.current_iteration}")
-        os.makedirs(iteration_dir, exist_ok=True)
-        
-        # Save this specific interaction
-        interaction_file = os.path.join(iteration_dir, f"{action_type}_interaction_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
-        with open(interaction_file, 'w') as f:
-            json.dump(interaction, f, indent=2)
+        # Append to the main interactions log (shared with the other step
+        # contexts writing into this output_dir). JSONL keeps this O(1)
+        # per interaction instead of re-parsing and rewriting the full
+        # history every call
+        append_interaction(self.output_dir, interaction)
+
+        # Also save this specific interaction to the iteration directory
+        interaction_file = os.path.join(self.iteration_dir, f"{action_type}_interaction_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(interaction_file, 'wb') as f:
+            f.write(jdumps(interaction, indent=True))
     
+    def read_interactions_log(self):
+        """Yield the logged interactions from disk, oldest first."""
+        return read_interactions(self.output_dir)
+
     def __str__(self):
         return f"ModificationContext(cwe={self.cwe_number}, iteration={self.current_iteration})"
     
@@ -5,6 +5,18 @@ Tools for QL Query Modification
 import os
 import re
 
+# Patterns compiled once at import; the functions below run on every
+# iteration and re.compile's cache lookup (hash + dict probe per call)
+# is avoidable overhead on that path
+_TAG_RE = re.compile(r'\* @tags?\s+(.+)')
+_KIND_RE = re.compile(r'\* @kind\s+(.+)')
+_DESC_RE = re.compile(r'\* @description\s+(.+)')
+_CWE_RE = re.compile(r'external/cwe/cwe-(\d+)', re.IGNORECASE)
+_REQUIRED_PATTERNS = [
+    re.compile(r'import\s+\w+', re.IGNORECASE | re.DOTALL),  # Import statements
+    re.compile(r'from\s+.+\s+where\s+.+\s+select', re.IGNORECASE | re.DOTALL),  # Basic query structure
+]
+
 
 def extract_ql_metadata(ql_content):
     """Extract metadata from QL query content."""
@@ -14,47 +26,47 @@ def extract_ql_metadata(ql_content):
         'description': None,
         'cwe_numbers': []
     }
-    
+
     # Extract @tags
-    tag_matches = re.findall(r'\* @tags?\s+(.+)', ql_content)
+    tag_matches = _TAG_RE.findall(ql_content)
     for match in tag_matches:
         tags = [tag.strip() for tag in match.split()]
         metadata['tags'].extend(tags)
-    
+
     # Extract @kind
-    kind_match = re.search(r'\* @kind\s+(.+)', ql_content)
+    kind_match = _KIND_RE.search(ql_content)
     if kind_match:
         metadata['kind'] = kind_match.group(1).strip()
-    
+
     # Extract @description
-    desc_match = re.search(r'\* @description\s+(.+)', ql_content)
+    desc_match = _DESC_RE.search(ql_content)
     if desc_match:
         metadata['description'] = desc_match.group(1).strip()
-    
+
     # Extract CWE numbers from tags
     for tag in metadata['tags']:
-        cwe_match = re.match(r'external/cwe/cwe-(\d+)', tag, re.IGNORECASE)
+        cwe_match = _CWE_RE.match(tag)
         if cwe_match:
             metadata['cwe_numbers'].append(int(cwe_match.group(1)))
-    
+
     return metadata
 
 
 def validate_ql_syntax(ql_content):
     """Basic validation of QL syntax (placeholder for actual validation)."""
     # Check for basic QL structure
-    required_patterns = [
-        r'import\s+\w+',  # Import statements
-        r'from\s+.+\s+where\s+.+\s+select',  # Basic query structure
-    ]
-    
-    for pattern in required_patterns:
-        if not re.search(pattern, ql_content, re.IGNORECASE | re.DOTALL):
-            return False, f"Missing required pattern: {pattern}"
-    
+    for pattern in _REQUIRED_PATTERNS:
+        if not pattern.search(ql_content):
+            return False, f"Missing required pattern: {pattern.pattern}"
+
     return True, "Basic syntax validation passed"
 
 
+def _count_line_starts(content, token):
+    """Count lines beginning with token; str.count runs at memchr speed."""
+    return content.count('\n' + token) + content.startswith(token)
+
+
 def compare_query_versions(original_content, modified_content):
     """Compare original and modified queries to identify changes."""
     changes = {
@@ -62,26 +74,27 @@ def compare_query_versions(original_content, modified_content):
         'lines_removed': 0,
         'structural_changes': []
     }
-    
-    original_lines = original_content.split('\n')
-    modified_lines = modified_content.split('\n')
-    
-    # Simple line count comparison
-    changes['lines_added'] = max(0, len(modified_lines) - len(original_lines))
-    changes['lines_removed'] = max(0, len(original_lines) - len(modified_lines))
-    
+
+    # Unchanged content - the common "modification kept the file as-is"
+    # case - needs no counting at all
+    if original_content == modified_content:
+        return changes
+
+    # Simple line count comparison; counting newlines avoids the
+    # per-line string allocations of split('\n')
+    original_lines = original_content.count('\n') + 1
+    modified_lines = modified_content.count('\n') + 1
+    changes['lines_added'] = max(0, modified_lines - original_lines)
+    changes['lines_removed'] = max(0, original_lines - modified_lines)
+
     # Check for structural changes (simplified)
-    original_imports = len(re.findall(r'^import\s+', original_content, re.MULTILINE))
-    modified_imports = len(re.findall(r'^import\s+', modified_content, re.MULTILINE))
-    
-    if modified_imports > original_imports:
+    if (_count_line_starts(modified_content, 'import ')
+            > _count_line_starts(original_content, 'import ')):
         changes['structural_changes'].append('Added new imports')
-    
+
     # Check for predicate additions
-    original_predicates = len(re.findall(r'^predicate\s+\w+', original_content, re.MULTILINE))
-    modified_predicates = len(re.findall(r'^predicate\s+\w+', modified_content, re.MULTILINE))
-    
-    if modified_predicates > original_predicates:
+    if (_count_line_starts(modified_content, 'predicate ')
+            > _count_line_starts(original_content, 'predicate ')):
         changes['structural_changes'].append('Added new predicates')
-    
-    return changes
\ No newline at end of file
+
+    return changes
@@ -3,15 +3,50 @@ QL Query Execution Configuration
 Defines the state machine for running QL queries using CodeQL.
 """
 
+import functools
 import subprocess
 import os
-import csv
-import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from QLWorkflow._02_run_ql_query.query_tools import stream_result_distribution
+from QLWorkflow.util.evaluation_utils import evaluate_sarif_results
+from QLWorkflow.util.fastcopy import fast_copy
+from QLWorkflow.util.fastjson import jloads, jdumps
+
+# ijson streams the SARIF tokens without building the document tree;
+# counting threadFlows in a multi-MB file then needs O(1) memory. Fall
+# back to a full parse when it isn't installed
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+_THREADFLOW_PREFIX = 'runs.item.results.item.codeFlows.item.threadFlows.item'
 
 # Get the directory of the script for relative paths
 SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+@functools.lru_cache(maxsize=None)
+def _juliet_cwe_dir(cwe_number):
+    """Locate the Juliet testcase directory for a CWE, scanning once.
+
+    The testcases tree holds ~120 CWE directories and never changes
+    during a run, so the prefix scan is cached per CWE for the process.
+    """
+    testcases_base = os.path.join(SCRIPT_DIR, 'juliet-test-suite-c', 'testcases')
+    prefix = f'CWE{cwe_number}_'
+    try:
+        with os.scandir(testcases_base) as it:
+            for entry in it:
+                if entry.name.startswith(prefix) and entry.is_dir():
+                    return entry.path
+    except FileNotFoundError:
+        pass
+    return None
+
+
 def run_ql_query_action(machine):
     """
     Action to execute the QL query using run_juliet.py.
@@ -23,13 +58,9 @@ def run_ql_query_action(machine):
     print(f"\n[Run QL Query] Executing query for CWE-{cwe_number} iteration {machine.context.current_iteration}")
     print(f"[Run QL Query] Input QL file: {ql_path}")
     
-    # Create output directory for this iteration
-    iteration_dir = os.path.join(machine.context.output_dir, f"iteration_{machine.context.current_iteration}")
-    os.makedirs(iteration_dir, exist_ok=True)
-    
-    # Use query_results directory for both input and output
-    query_output_dir = os.path.join(iteration_dir, 'query_results')
-    os.makedirs(query_output_dir, exist_ok=True)
+    # Use query_results directory for both input and output; memoized on
+    # the context, which creates it on first access
+    query_output_dir = machine.context.query_results_dir
     
     # The modified query should already be in the passed ql_path
     print(f"[Run QL Query] Using query from: {ql_path}")
@@ -37,18 +68,27 @@ def run_ql_query_action(machine):
     # For proper module resolution, we need to run from the project's codeql directory
     # If the query is not already in the codeql directory, copy it there with a different name
     if hasattr(machine.context, 'original_ql_path') and not ql_path.startswith(os.path.dirname(machine.context.original_ql_path)):
-        import shutil
         original_dir = os.path.dirname(machine.context.original_ql_path)
         original_name = os.path.basename(machine.context.original_ql_path)
-        
-        # Create a temporary file with a unique name to avoid conflicts
-        temp_name = f"{os.path.splitext(original_name)[0]}_modified_{machine.context.current_iteration}.ql"
+
+        # One temp name reused across iterations; the _run suffix keeps it
+        # clear of the _modified.ql scratch file the modification step uses
+        temp_name = f"{os.path.splitext(original_name)[0]}_modified_run.ql"
         temp_ql_path = os.path.join(original_dir, temp_name)
-        
-        # Copy the modified QL file to the codeql directory with temp name
-        shutil.copy2(ql_path, temp_ql_path)
-        print(f"[Run QL Query] Copied modified QL to codeql directory as: {temp_ql_path}")
-        
+
+        # Hardlink the modified QL into the codeql directory: O(1) inode
+        # work on the same filesystem instead of a byte copy. Fall back
+        # to a copy across devices or where links are unsupported
+        try:
+            os.remove(temp_ql_path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.link(ql_path, temp_ql_path)
+        except (OSError, NotImplementedError):
+            fast_copy(ql_path, temp_ql_path)
+        print(f"[Run QL Query] Linked modified QL into codeql directory as: {temp_ql_path}")
+
         # Use the temp path in codeql directory for execution
         ql_path = temp_ql_path
         machine.context.temp_ql_path = temp_ql_path  # Store for cleanup later
@@ -69,41 +109,46 @@ def run_ql_query_action(machine):
     try:
         print(f"[Run QL Query] Running command: {' '.join(command)}")
         # record running time
-        import time
         start_time = time.time()
-        result = subprocess.run(command, capture_output=True, text=True)
+        # Popen + communicate instead of subprocess.run: the CodeQL call
+        # dominates wall time and communicate() releases the GIL while it
+        # waits, so run_ql_queries_batch can overlap several runs
+        proc = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        stdout, stderr = proc.communicate()
         end_time = time.time()
         running_time = end_time - start_time
         print(f"[Run QL Query] Running time: {running_time:.2f} seconds")
-        
+
         # Save command output
         output_log = {
             'command': ' '.join(command),
-            'stdout': result.stdout,
-            'stderr': result.stderr,
-            'returncode': result.returncode,
+            'stdout': stdout,
+            'stderr': stderr,
+            'returncode': proc.returncode,
             'running_time': running_time
         }
         
         # Save log in the query output directory
         log_file = os.path.join(query_output_dir, 'query_execution_log.json')
-        with open(log_file, 'w') as f:
-            json.dump(output_log, f, indent=2)
+        with open(log_file, 'wb') as f:
+            f.write(jdumps(output_log, indent=True))
         
-        if result.returncode != 0:
-            return f"Query execution failed: {result.stderr}"
+        if proc.returncode != 0:
+            return f"Query execution failed: {stderr}"
         
         # Look for CSV file in the output directory
-        # Both CSV and SARIF files are generated in the same directory
+        # Both CSV and SARIF files are generated in the same directory.
+        # scandir iterates lazily, so the walk stops at the first match
+        # instead of materializing the whole listing like os.listdir
         csv_file = None
-        
-        # Find CSV file in the output directory
-        for file in os.listdir(query_output_dir):
-            if file.endswith('.csv'):
-                csv_file = os.path.join(query_output_dir, file)
-                print(f"[Run QL Query] Found CSV file: {csv_file}")
-                break
-        
+        with os.scandir(query_output_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.csv') and entry.is_file():
+                    csv_file = entry.path
+                    print(f"[Run QL Query] Found CSV file: {csv_file}")
+                    break
+
         if not csv_file:
             print(f"[Run QL Query] No CSV file found in {query_output_dir}")
         
@@ -111,21 +156,33 @@ def run_ql_query_action(machine):
         
         if not csv_file:
             print(f"[Run QL Query] WARNING: No CSV file found after query execution")
-        
-        # Clean up temporary file if created
-        if hasattr(machine.context, 'temp_ql_path') and os.path.exists(machine.context.temp_ql_path):
-            os.remove(machine.context.temp_ql_path)
-            print(f"[Run QL Query] Cleaned up temporary QL file: {machine.context.temp_ql_path}")
-        
+
         return "Query executed successfully"
-        
+
     except Exception as e:
-        # Clean up temporary file in case of error
-        if hasattr(machine.context, 'temp_ql_path') and os.path.exists(machine.context.temp_ql_path):
-            os.remove(machine.context.temp_ql_path)
-            print(f"[Run QL Query] Cleaned up temporary QL file after error: {machine.context.temp_ql_path}")
-        
         return f"Error executing query: {str(e)}"
+    finally:
+        # Single cleanup path for the temp link, covering success, the
+        # failed-run return, and exceptions alike
+        temp_ql_path = getattr(machine.context, 'temp_ql_path', None)
+        if temp_ql_path:
+            try:
+                os.remove(temp_ql_path)
+                print(f"[Run QL Query] Cleaned up temporary QL file: {temp_ql_path}")
+            except FileNotFoundError:
+                pass
+
+
+def run_ql_queries_batch(machines, max_concurrent=2):
+    """
+    Run run_ql_query_action for several machines concurrently.
+
+    Each query spends most of its time waiting on the CodeQL subprocess,
+    during which the GIL is released, so a small thread pool genuinely
+    overlaps runs across CWEs. Results come back in input order.
+    """
+    with ThreadPoolExecutor(max_workers=max_concurrent) as pool:
+        return list(pool.map(run_ql_query_action, machines))
 
 
 def parse_query_results_action(machine):
@@ -142,44 +199,55 @@ def parse_query_results_action(machine):
     else:
         sarif_path = None
     
-    # First try to parse SARIF for threadFlow count
+    # First pass over the SARIF only needs the threadFlow count, so
+    # stream it when possible instead of materializing the whole tree
     threadflow_count = 0
-    if sarif_path and os.path.exists(sarif_path):
-        try:
-            with open(sarif_path, 'r', encoding='utf-8') as f:
-                sarif_data = json.load(f)
-            
+    sarif_data = None
+    sarif_exists = False
+    # EAFP: open directly; a separate exists() probe would cost an extra
+    # stat, and TypeError covers sarif_path being None
+    try:
+        if ijson is not None:
+            with open(sarif_path, 'rb') as f:
+                sarif_exists = True
+                for _ in ijson.items(f, _THREADFLOW_PREFIX, use_float=True):
+                    threadflow_count += 1
+        else:
+            with open(sarif_path, 'rb') as f:
+                sarif_exists = True
+                sarif_data = jloads(f.read())
             # Count all threadFlows
             for run in sarif_data.get('runs', []):
                 for result in run.get('results', []):
                     for code_flow in result.get('codeFlows', []):
                         threadflow_count += len(code_flow.get('threadFlows', []))
-            
-            print(f"[Run QL Query] Found SARIF file with {threadflow_count} threadFlows")
-        except Exception as e:
-            print(f"[Run QL Query] Error parsing SARIF: {str(e)}")
-    
-    # Fall back to CSV parsing if needed
-    if not machine.context.query_result_file or not os.path.exists(machine.context.query_result_file):
+
+        print(f"[Run QL Query] Found SARIF file with {threadflow_count} threadFlows")
+    except (FileNotFoundError, TypeError):
+        pass  # no SARIF produced for this run
+    except Exception as e:
+        print(f"[Run QL Query] Error parsing SARIF: {str(e)}")
+
+    # Fall back to CSV parsing if needed; again open instead of probing
+    try:
+        csv_f = open(machine.context.query_result_file, 'r')
+    except (FileNotFoundError, TypeError):
         machine.context.query_results = []
         machine.context.result_count = threadflow_count if threadflow_count > 0 else 0
         print(f"[Run QL Query] No results file found at: {machine.context.query_result_file}")
         return "No results file found"
-    
+
     try:
-        results = []
-        with open(machine.context.query_result_file, 'r') as f:
-            csv_reader = csv.DictReader(f)
-            for row in csv_reader:
-                results.append(row)
-        
-        machine.context.query_results = results
+        # One streaming pass gives both the row count and the per-file
+        # distribution; nothing downstream reads the individual rows, so
+        # the old DictReader list (a dict per row) is not materialized
+        with csv_f as f:
+            row_count, result_distribution = stream_result_distribution(f)
+
+        machine.context.query_results = []
         # Use threadFlow count if available, otherwise use CSV row count
-        machine.context.result_count = threadflow_count if threadflow_count > 0 else len(results)
-        
-        # Calculate result distribution
-        from QLWorkflow._02_run_ql_query.query_tools import analyze_result_distribution
-        machine.context.result_distribution = analyze_result_distribution(results)
+        machine.context.result_count = threadflow_count if threadflow_count > 0 else row_count
+        machine.context.result_distribution = result_distribution
         
         # Determine output directory based on context  
         if machine.context.current_iteration == 1 and hasattr(machine.context, 'is_origin_run') and machine.context.is_origin_run:
@@ -187,24 +255,19 @@ def parse_query_results_action(machine):
             output_dir = os.path.join(machine.context.output_dir, 'initial', 'query_results')
         else:
             # For all modified queries, save to iteration_X/query_results/
-            iteration_dir = os.path.join(machine.context.output_dir, f"iteration_{machine.context.current_iteration}")
-            output_dir = os.path.join(iteration_dir, 'query_results')
+            output_dir = machine.context.query_results_dir
         
         # Perform evaluation if SARIF exists
         evaluation_metrics = {}
-        if sarif_path and os.path.exists(sarif_path):
-            from QLWorkflow.util.evaluation_utils import evaluate_sarif_results
+        if sarif_exists:
             # Pass output_dir to save good/bad results
             # Find the actual CWE directory in Juliet test suite
-            testcases_base = os.path.join(SCRIPT_DIR, 'juliet-test-suite-c', 'testcases')
-            source_base_dir = None
-            if os.path.exists(testcases_base):
-                for dirname in os.listdir(testcases_base):
-                    if dirname.startswith(f'CWE{machine.context.cwe_number}_'):
-                        source_base_dir = os.path.join(testcases_base, dirname)
-                        break
-            
-            evaluation_metrics = evaluate_sarif_results(sarif_path, output_dir, source_base_dir)
+            source_base_dir = _juliet_cwe_dir(machine.context.cwe_number)
+
+
+            # Hand over the tree if the counting pass already parsed it
+            evaluation_metrics = evaluate_sarif_results(
+                sarif_path, output_dir, source_base_dir, sarif_data=sarif_data)
             print(f"[Run QL Query] Evaluation: TP={evaluation_metrics['true_positive_count']}, FP={evaluation_metrics['false_positive_count']}")
             print(f"[Run QL Query] Saved good_results.json and bad_results.json to {output_dir}")
         
@@ -213,7 +276,7 @@ def parse_query_results_action(machine):
             'ql_file': machine.context.ql_file_path,
             'result_count': machine.context.result_count,
             'csv_file': machine.context.query_result_file,
-            'sarif_file': sarif_path if sarif_path and os.path.exists(sarif_path) else None
+            'sarif_file': sarif_path if sarif_exists else None
         }
         
         # Add evaluation metrics if available
@@ -223,8 +286,8 @@ def parse_query_results_action(machine):
             machine.context.evaluation_metrics = evaluation_metrics
         
         complete_results_file = os.path.join(output_dir, 'results_log.json')
-        with open(complete_results_file, 'w') as f:
-            json.dump(complete_results, f, indent=2)
+        with open(complete_results_file, 'wb') as f:
+            f.write(jdumps(complete_results, indent=True))
         
         print(f"[Run QL Query] Parsed {machine.context.result_count} results")
         return f"Parsed {machine.context.result_count} results"
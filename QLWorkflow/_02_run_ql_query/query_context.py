@@ -2,6 +2,7 @@
 Context for QL Query Execution
 """
 
+import functools
 import os
 
 # Get the directory of the script for relative paths
@@ -52,6 +53,38 @@ class QueryContext:
         # Working directory for agent compatibility
         self.working_directory = kwargs.get('working_directory', self.output_dir)
     
+    @property
+    def current_iteration(self):
+        return self._current_iteration
+
+    @current_iteration.setter
+    def current_iteration(self, value):
+        self._current_iteration = value
+        # Drop the memoized per-iteration paths; they rebuild lazily
+        for cached in ('iteration_dir', 'reports_dir', 'query_results_dir'):
+            self.__dict__.pop(cached, None)
+
+    # Per-iteration directories, joined and created once per iteration
+    # instead of re-joining and re-stat'ing in every action
+
+    @functools.cached_property
+    def iteration_dir(self):
+        d = os.path.join(self.output_dir, f"iteration_{self.current_iteration}")
+        os.makedirs(d, exist_ok=True)
+        return d
+
+    @functools.cached_property
+    def reports_dir(self):
+        d = os.path.join(self.iteration_dir, 'reports')
+        os.makedirs(d, exist_ok=True)
+        return d
+
+    @functools.cached_property
+    def query_results_dir(self):
+        d = os.path.join(self.iteration_dir, 'query_results')
+        os.makedirs(d, exist_ok=True)
+        return d
+
     def get(self, key, default=None):
         """
         Get attribute value with dictionary-style access for compatibility with agent action utils.
@@ -2,6 +2,7 @@
 Tools for QL Query Execution
 """
 
+import csv
 import os
 import subprocess
 import json
@@ -55,6 +56,27 @@ def get_query_metadata(ql_file_path):
     return metadata
 
 
+def stream_result_distribution(csv_file):
+    """
+    Count result rows and build the per-file distribution in a single
+    streaming pass over an open CSV file, without allocating a dict per
+    row the way DictReader does.
+    """
+    row_count = 0
+    distribution = {}
+    reader = csv.reader(csv_file)
+    header = next(reader, None)
+    file_idx = header.index('File') if header and 'File' in header else None
+
+    for row in reader:
+        row_count += 1
+        if file_idx is not None and file_idx < len(row):
+            file_name = os.path.basename(row[file_idx])
+            distribution[file_name] = distribution.get(file_name, 0) + 1
+
+    return row_count, distribution
+
+
 def analyze_result_distribution(results):
     """Analyze the distribution of query results."""
     distribution = {}
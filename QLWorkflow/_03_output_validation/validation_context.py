@@ -6,6 +6,8 @@ import json
 import os
 from datetime import datetime
 
+from QLWorkflow.util.logging_utils import append_interaction
+
 # Get the directory of the script for relative paths
 SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -67,23 +69,10 @@ class ValidationContext:
         }
         self.interactions_log.append(interaction)
         
-        # Save to main interactions log file
-        log_file = os.path.join(self.output_dir, 'interactions_log.json')
-        os.makedirs(os.path.dirname(log_file), exist_ok=True)
-        
-        # Load existing log if exists
-        existing_log = []
-        if os.path.exists(log_file):
-            with open(log_file, 'r') as f:
-                existing_log = json.load(f)
-        
-        # Append new interaction
-        existing_log.append(interaction)
-        
-        # Save updated log
-        with open(log_file, 'w') as f:
-            json.dump(existing_log, f, indent=2)
-        
+        # Append to the main interactions log, shared with the
+        # modification context writing into the same output_dir
+        append_interaction(self.output_dir, interaction)
+
         # Also save to iteration-specific directory
         iteration_dir = os.path.join(self.output_dir, f"iteration_{self.current_iteration}")
         os.makedirs(iteration_dir, exist_ok=True)
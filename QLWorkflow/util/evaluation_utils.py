@@ -2,12 +2,13 @@
 Enhanced evaluation utilities using CodeQL-extracted function boundaries.
 """
 
-import json
 import os
 import csv
 import subprocess
 import time
 
+from QLWorkflow.util.fastjson import jloads, jdumps
+
 # Get the directory of the script for relative paths
 SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -343,15 +344,16 @@ def classify_result(thread_flow, sarif_result, function_map):
     return 'unknown'
 
 
-def evaluate_sarif_results(sarif_path, output_dir=None, source_base_dir=None):
+def evaluate_sarif_results(sarif_path, output_dir=None, source_base_dir=None, sarif_data=None):
     """
     Enhanced evaluation using CodeQL-extracted function boundaries.
-    
+
     Args:
         sarif_path: Path to the SARIF file
-        output_dir: Optional directory to save good_results.json and bad_results.json  
-        cwe_number: CWE number for extracting function boundaries
-        
+        output_dir: Optional directory to save good_results.json and bad_results.json
+        source_base_dir: Juliet testcase directory for the CWE
+        sarif_data: Optional already-parsed SARIF tree; skips re-reading sarif_path
+
     Returns:
         dict: Evaluation metrics including TP/FP counts and rates
     """
@@ -391,9 +393,10 @@ def evaluate_sarif_results(sarif_path, output_dir=None, source_base_dir=None):
         print(f"Extracted {len(function_map)} function-line mappings")
     
     try:
-        with open(sarif_path, 'r', encoding='utf-8') as f:
-            sarif_data = json.load(f)
-        
+        if sarif_data is None:
+            with open(sarif_path, 'rb') as f:
+                sarif_data = jloads(f.read())
+
         good_count = 0
         bad_count = 0
         unknown_count = 0
@@ -491,30 +494,30 @@ def evaluate_sarif_results(sarif_path, output_dir=None, source_base_dir=None):
         if output_dir and os.path.exists(output_dir):
             # Save good results (false positives)
             good_results_file = os.path.join(output_dir, 'good_results.json')
-            with open(good_results_file, 'w', encoding='utf-8') as f:
-                json.dump({
+            with open(good_results_file, 'wb') as f:
+                f.write(jdumps({
                     'count': good_count,
                     'description': 'ThreadFlows in code marked as "good" (known false positives)',
                     'results': good_results
-                }, f, indent=2)
+                }, indent=True))
             
             # Save bad results (true positives)
             bad_results_file = os.path.join(output_dir, 'bad_results.json')
-            with open(bad_results_file, 'w', encoding='utf-8') as f:
-                json.dump({
+            with open(bad_results_file, 'wb') as f:
+                f.write(jdumps({
                     'count': bad_count,
                     'description': 'ThreadFlows in code marked as "bad" (true positives)',
                     'results': bad_results
-                }, f, indent=2)
+                }, indent=True))
             
             # Save unknown results
             unknown_results_file = os.path.join(output_dir, 'unknown_results.json')
-            with open(unknown_results_file, 'w', encoding='utf-8') as f:
-                json.dump({
+            with open(unknown_results_file, 'wb') as f:
+                f.write(jdumps({
                     'count': unknown_count,
                     'description': 'ThreadFlows in unmarked code (classification unknown)',
                     'results': unknown_results
-                }, f, indent=2)
+                }, indent=True))
         
         return {
             'good_result_count': good_count,
@@ -0,0 +1,32 @@
+"""
+Fast JSON helpers for QLWorkflow
+
+Thin wrappers over orjson's C encoder/decoder with a transparent stdlib
+fallback. Both directions work on bytes, so callers open files in
+binary mode and skip the str round trip; CodeQL SARIF output can reach
+tens of MB, where the parser difference is a few-fold wall-time win.
+"""
+
+try:
+    import orjson
+
+    def jloads(data):
+        """Parse JSON from bytes (or str)."""
+        return orjson.loads(data)
+
+    def jdumps(obj, indent=False):
+        """Serialize obj to JSON bytes; indent=True pretty-prints for humans."""
+        if indent:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        return orjson.dumps(obj)
+
+except ImportError:
+    import json
+
+    def jloads(data):
+        """Parse JSON from bytes (or str)."""
+        return json.loads(data)
+
+    def jdumps(obj, indent=False):
+        """Serialize obj to JSON bytes; indent=True pretty-prints for humans."""
+        return json.dumps(obj, indent=2 if indent else None).encode()
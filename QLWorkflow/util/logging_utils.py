@@ -2,9 +2,12 @@
 Logging utilities for QLWorkflow
 """
 
+import os
 from pathlib import Path
 from typing import Dict, Any, Optional
 
+from QLWorkflow.util.fastjson import jloads, jdumps
+
 
 def get_ql_workflow_log_path(context: Dict[str, Any]) -> Optional[Path]:
     """
@@ -31,6 +34,48 @@ def get_ql_workflow_log_path(context: Dict[str, Any]) -> Optional[Path]:
         return base_log_dir / f"iteration_{iteration}" / 'session_log'
 
 
+def _migrate_json_to_jsonl(json_file: str, jsonl_file: str) -> None:
+    """One-time conversion of a legacy interactions_log.json list to JSONL."""
+    if not os.path.exists(json_file) or os.path.exists(jsonl_file):
+        return
+    with open(json_file, 'rb') as f:
+        existing_log = jloads(f.read())
+    with open(jsonl_file, 'wb') as f:
+        for interaction in existing_log:
+            f.write(jdumps(interaction) + b'\n')
+    os.remove(json_file)
+
+
+def append_interaction(output_dir: str, interaction: Dict[str, Any]) -> None:
+    """
+    Append one record to output_dir's shared interactions log.
+
+    The log is interactions_log.jsonl so each write is an O(1) append.
+    Every step context logging into the same output_dir must go through
+    here: a step still read-modify-writing the legacy .json file would
+    race the migration and fork the history across two files.
+    """
+    log_file = os.path.join(output_dir, 'interactions_log.jsonl')
+    os.makedirs(output_dir, exist_ok=True)
+    _migrate_json_to_jsonl(
+        os.path.join(output_dir, 'interactions_log.json'), log_file)
+    with open(log_file, 'ab') as f:
+        f.write(jdumps(interaction) + b'\n')
+
+
+def read_interactions(output_dir: str):
+    """Yield the interactions logged under output_dir, oldest first."""
+    log_file = os.path.join(output_dir, 'interactions_log.jsonl')
+    _migrate_json_to_jsonl(
+        os.path.join(output_dir, 'interactions_log.json'), log_file)
+    if not os.path.exists(log_file):
+        return
+    with open(log_file, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield jloads(line)
+
+
 def get_action_type_from_prompt(prompt: str) -> str:
     """
     Determine action type based on prompt content.